@@ -0,0 +1,80 @@
+"""
+The assignment module solves the assignment problem: matching the rows of a
+cost matrix to its columns so that the total cost is as small as possible.
+"""
+
+
+def min_cost_assignment(cost):
+    """Return the column assigned to each row of <cost> by a matching of
+    rows to columns with the smallest total cost, or None for the rows left
+    unmatched when there are more rows than columns.
+
+    This is the Hungarian algorithm, which takes O(n * n * m) time for n
+    rows and m columns, where n <= m.
+
+    @type cost: list[list[float]]
+        A rectangular matrix of costs.
+    @rtype: list[int | None]
+
+    >>> min_cost_assignment([[4, 1, 3], [2, 0, 5], [3, 2, 2]])
+    [1, 0, 2]
+    >>> min_cost_assignment([[1], [0]])
+    [None, 0]
+    """
+    if not cost or not cost[0]:
+        return [None] * len(cost)
+    if len(cost) > len(cost[0]):
+        transposed = [list(column) for column in zip(*cost)]
+        assignment = [None] * len(cost)
+        for column, row in enumerate(min_cost_assignment(transposed)):
+            assignment[row] = column
+        return assignment
+
+    rows = len(cost)
+    columns = len(cost[0])
+    infinity = float("inf")
+    # Potentials for the rows and columns, the row matched to each column
+    # and the previous column on the augmenting path, all 1-indexed so that
+    # column 0 can stand for the row being added.
+    row_potential = [0] * (rows + 1)
+    column_potential = [0] * (columns + 1)
+    matched_row = [0] * (columns + 1)
+    previous = [0] * (columns + 1)
+    for row in range(1, rows + 1):
+        matched_row[0] = row
+        column = 0
+        slack = [infinity] * (columns + 1)
+        used = [False] * (columns + 1)
+        while matched_row[column] != 0:
+            used[column] = True
+            current_row = matched_row[column]
+            costs = cost[current_row - 1]
+            delta = infinity
+            next_column = 0
+            for j in range(1, columns + 1):
+                if not used[j]:
+                    reduced = costs[j - 1] - row_potential[current_row] - \
+                        column_potential[j]
+                    if reduced < slack[j]:
+                        slack[j] = reduced
+                        previous[j] = column
+                    if slack[j] < delta:
+                        delta = slack[j]
+                        next_column = j
+            for j in range(columns + 1):
+                if used[j]:
+                    row_potential[matched_row[j]] += delta
+                    column_potential[j] -= delta
+                else:
+                    slack[j] -= delta
+            column = next_column
+        while column != 0:
+            previous_column = previous[column]
+            matched_row[column] = matched_row[previous_column]
+            column = previous_column
+
+    assignment = [None] * rows
+    for column in range(1, columns + 1):
+        if matched_row[column] != 0:
+            assignment[matched_row[column] - 1] = column - 1
+    return assignment
@@ -0,0 +1,317 @@
+"""
+The benchmark module times the event queues, the dispatcher, the monitors
+and whole simulation runs, and saves the results as JSON so that they can be
+compared between revisions.
+
+The benchmarks are:
+
+    queue       add and remove throughput of PriorityQueue and CalendarQueue
+    parse       seconds to read an event file with create_event_list, and
+                with the bulk loader into columns and into a list
+    dispatcher  request_driver latency against the fleet size, for a
+                DriverIndex and a Fleet
+    monitor     notify and report cost of Monitor, StreamingMonitor and
+                ColumnarMonitor
+    end_to_end  events per second and peak memory of Simulation.run on
+                synthetic workloads of increasing size
+
+Each end-to-end run is done in a freshly spawned worker process, so that
+its peak resident memory is not inflated by the runs before it.
+
+Run it as a script:
+
+    python benchmark.py [--sizes N ...] [--output FILE] [--compare FILE]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bulk_loader import load_event_columns, load_event_list
+from columnar_monitor import ColumnarMonitor
+from container import CalendarQueue, PriorityQueue
+from dispatcher import Dispatcher
+from driver import Driver
+from event import create_event_list
+from fleet import Fleet
+from location import Location
+from monitor import (Monitor, StreamingMonitor, RIDER, DRIVER, REQUEST,
+                     PICKUP, DROPOFF)
+from rider import Rider, WAITING
+from simulation import Simulation
+from spatial_index import DriverIndex
+from travel import get_travel_times, set_travel_times
+from workload import Workload, write_text_events
+
+# The default sizes of the end-to-end runs and of the micro-benchmarks.
+SIZES = [1000, 10000, 100000, 1000000]
+QUEUE_SIZE = 100000
+PARSE_LINES = 300000
+FLEET_SIZES = [10, 100, 1000, 10000]
+REQUESTS = 1000
+MONITOR_RIDERS = 50000
+GRID_SIZE = 100
+
+
+def best_time(function, repeat=3):
+    """Return the shortest of <repeat> wall-clock times of calls to
+    <function>, in seconds.
+
+    @type function: () -> object
+    @type repeat: int
+    @rtype: float
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_queues(size=QUEUE_SIZE):
+    """Return the number of add and remove operations per second of each
+    event queue, for <size> events added in random order and then removed.
+
+    @type size: int
+    @rtype: dict[str, dict[str, float]]
+    """
+    events = list(Workload(size, grid_size=GRID_SIZE))
+    random.Random(0).shuffle(events)
+    results = {}
+    for queue_class in [PriorityQueue, CalendarQueue]:
+        def add_and_remove():
+            queue = queue_class()
+            for event in events:
+                queue.add(event)
+            while not queue.is_empty():
+                queue.remove()
+
+        seconds = best_time(add_and_remove)
+        results[queue_class.__name__] = {
+            "operations_per_second": 2 * size / seconds}
+    return results
+
+
+def bench_parsing(lines=PARSE_LINES):
+    """Return the seconds taken to read an event file of <lines> events with
+    create_event_list, load_event_columns and load_event_list.
+
+    @type lines: int
+    @rtype: dict[str, float]
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "events.txt")
+        write_text_events(filename, Workload(lines, grid_size=GRID_SIZE))
+        return {function.__name__: best_time(lambda: function(filename))
+                for function in [create_event_list, load_event_columns,
+                                 load_event_list]}
+
+
+def bench_dispatcher(fleet_sizes=FLEET_SIZES, requests=REQUESTS):
+    """Return the average latency of request_driver, in seconds, for each
+    driver index and each fleet size in <fleet_sizes>.
+
+    Every driver is idle, so each request finds the closest of the whole
+    fleet.
+
+    @type fleet_sizes: list[int]
+    @type requests: int
+    @rtype: dict[str, dict[str, float]]
+    """
+    generator = random.Random(0)
+    riders = [Rider("Rider{}".format(i), _location(generator),
+                    _location(generator), WAITING, 10)
+              for i in range(requests)]
+    results = {}
+    for index_class in [DriverIndex, Fleet]:
+        latencies = {}
+        for fleet_size in fleet_sizes:
+            dispatcher = Dispatcher(index_class())
+            for i in range(fleet_size):
+                dispatcher.request_rider(Driver("Driver{}".format(i),
+                                                _location(generator),
+                                                generator.randint(1, 5)))
+
+            def request_all():
+                for rider in riders:
+                    dispatcher.request_driver(rider)
+
+            latencies[str(fleet_size)] = best_time(request_all) / requests
+        results[index_class.__name__] = latencies
+    return results
+
+
+def bench_monitors(riders=MONITOR_RIDERS):
+    """Return the average cost of notify and the cost of report, in seconds,
+    of each monitor, for the activities of <riders> rides.
+
+    @type riders: int
+    @rtype: dict[str, dict[str, float]]
+    """
+    generator = random.Random(0)
+    activities = []
+    for i in range(riders):
+        rider = "Rider{}".format(i)
+        driver = "Driver{}".format(i)
+        start, origin, destination = (_location(generator),
+                                      _location(generator),
+                                      _location(generator))
+        activities.extend([(i, DRIVER, REQUEST, driver, start),
+                           (i, RIDER, REQUEST, rider, origin),
+                           (i + 5, DRIVER, PICKUP, driver, origin),
+                           (i + 5, RIDER, PICKUP, rider, origin),
+                           (i + 9, DRIVER, DROPOFF, driver, destination)])
+    results = {}
+    for monitor_class in [Monitor, StreamingMonitor, ColumnarMonitor]:
+        monitor = monitor_class()
+        start = time.perf_counter()
+        for activity in activities:
+            monitor.notify(*activity)
+        notify = (time.perf_counter() - start) / len(activities)
+        results[monitor_class.__name__] = {
+            "notify_seconds": notify,
+            "report_seconds": best_time(monitor.report)}
+    return results
+
+
+def _location(generator):
+    """Return a random location on the benchmark grid.
+
+    @type generator: random.Random
+    @rtype: Location
+    """
+    return Location(generator.randrange(GRID_SIZE),
+                    generator.randrange(GRID_SIZE))
+
+
+def run_end_to_end(size):
+    """Run a simulation of a synthetic workload of <size> events, streamed
+    into Simulation.run, and return the events per second and the peak
+    resident memory of this process in megabytes.
+
+    @type size: int
+    @rtype: dict[str, float]
+    """
+    workload = Workload(size, grid_size=GRID_SIZE)
+    start = time.perf_counter()
+    Simulation(monitor=StreamingMonitor()).run(workload, stream=True)
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "events_per_second": size / seconds,
+            "peak_memory_mb":
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+def bench_end_to_end(sizes=SIZES):
+    """Return the results of run_end_to_end for each of <sizes>, each run in
+    a freshly spawned worker process with the travel time service in use.
+
+    @type sizes: list[int]
+    @rtype: dict[str, dict[str, float]]
+    """
+    results = {}
+    for size in sizes:
+        with ProcessPoolExecutor(
+                1, multiprocessing.get_context("spawn"),
+                initializer=set_travel_times,
+                initargs=(get_travel_times(),)) as executor:
+            results[str(size)] = executor.submit(run_end_to_end, size).result()
+    return results
+
+
+def run(sizes=SIZES):
+    """Run every benchmark and return the results, with a description of
+    the revision and machine they were run on.
+
+    @type sizes: list[int]
+    @rtype: dict[str, object]
+    """
+    return {"revision": _revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "queue": bench_queues(),
+            "parse": bench_parsing(),
+            "dispatcher": bench_dispatcher(),
+            "monitor": bench_monitors(),
+            "end_to_end": bench_end_to_end(sizes)}
+
+
+def _revision():
+    """Return the git commit of the working tree, or None if it is not a git
+    working tree.
+
+    @rtype: str | None
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new):
+    """Return the ratio of each result in <new> to the same result in <old>,
+    nested the same way as the results.
+
+    @type old: dict[str, object]
+    @type new: dict[str, object]
+    @rtype: dict[str, object]
+
+    >>> compare({"queue": {"a": 2.0}, "revision": "x"},
+    ...         {"queue": {"a": 3.0}, "revision": "y"})
+    {'queue': {'a': 1.5}}
+    """
+    ratios = {}
+    for key, value in new.items():
+        if isinstance(value, dict) and isinstance(old.get(key), dict):
+            ratios[key] = compare(old[key], value)
+        elif isinstance(value, float) and old.get(key):
+            ratios[key] = value / old[key]
+    return ratios
+
+
+def _print(results, indent=""):
+    """Print the nested <results>, one value per line.
+
+    @type results: dict[str, object]
+    @type indent: str
+    @rtype: None
+    """
+    for key, value in results.items():
+        if isinstance(value, dict):
+            print(indent + key)
+            _print(value, indent + "  ")
+        elif isinstance(value, float):
+            print("{}{:<24}{:>14.6g}".format(indent, key, value))
+        else:
+            print("{}{:<24}{:>14}".format(indent, key, str(value)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the benchmarks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES,
+                        help="numbers of events of the end-to-end runs")
+    parser.add_argument("--output", default=None,
+                        help="JSON file to save the results to")
+    parser.add_argument("--compare", default=None,
+                        help="JSON results of an earlier revision to compare "
+                             "with, as ratios of new to old")
+    arguments = parser.parse_args()
+
+    results = run(arguments.sizes)
+    _print(results)
+    if arguments.output is not None:
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if arguments.compare is not None:
+        with open(arguments.compare) as file:
+            print("ratios of new to old")
+            _print(compare(json.load(file), results))
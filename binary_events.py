@@ -0,0 +1,238 @@
+"""
+The binary_events module contains a compact binary format for event files,
+a converter from the text format, and a loader for the binary format.
+
+A binary event file holds a header, a string table of driver and rider
+identifiers, and one fixed-width record per event:
+
+    header        magic, byte order, string count, record count
+    string table  (string count + 1) uint32 offsets, then the UTF-8 bytes
+                  of every identifier, padded to a multiple of 4 bytes
+    records       RECORD_FIELDS int32 values per event
+
+Each record holds the timestamp, the event type, the index of the
+identifier in the string table, the row and column of the location, the
+row and column of the destination (0 for drivers), and the speed of a
+driver or the patience of a rider. Integers are stored in the byte order of
+the machine that wrote the file.
+
+The loader memory-maps the file and reads the records in place through a
+memoryview, so only the identifiers are decoded up front.
+
+=== Constants ===
+@type DRIVER_REQUEST: int
+    The event type of a DriverRequest record.
+@type RIDER_REQUEST: int
+    The event type of a RiderRequest record.
+@type RECORD_FIELDS: int
+    The number of int32 values in each record.
+"""
+import mmap
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+
+from driver import Driver
+from event import DriverRequest, RiderRequest, iter_events
+from location import Location
+from rider import Rider, WAITING
+
+DRIVER_REQUEST = 0
+RIDER_REQUEST = 1
+RECORD_FIELDS = 8
+
+_MAGIC = b"EVTB"
+_HEADER = struct.Struct("<4sBxxxII")
+_BYTE_ORDERS = {"little": 0, "big": 1}
+_OFFSET = struct.Struct("I")
+_RECORD = struct.Struct("{}i".format(RECORD_FIELDS))
+
+
+def convert_event_file(text_filename, binary_filename):
+    """Convert the text event file <text_filename> into a binary event file
+    written to <binary_filename>, and return the number of events written.
+
+    Precondition: the file stored at <text_filename> is in the format
+    specified by the assignment handout.
+
+    @type text_filename: str
+    @type binary_filename: str
+    @rtype: int
+    """
+    strings = {}
+    records = array("i")
+    for event in iter_events(text_filename):
+        actor = event.driver if isinstance(event, DriverRequest) \
+            else event.rider
+        records.extend(_record(event, strings.setdefault(actor.identifier,
+                                                         len(strings))))
+    write_event_records(binary_filename, list(strings), records)
+    return len(records) // RECORD_FIELDS
+
+
+def write_event_stream(filename, events):
+    """Write a binary event file to <filename> holding <events>, and return
+    the number of events written.
+
+    Unlike convert_event_file, identifiers are not shared between events,
+    and the string table and records are spooled to temporary files, so
+    any number of events can be written in constant memory.
+
+    @type filename: str
+    @type events: iterable[DriverRequest | RiderRequest]
+    @rtype: int
+    """
+    count = 0
+    length = 0
+    with tempfile.TemporaryFile() as offsets, \
+            tempfile.TemporaryFile() as blob, \
+            tempfile.TemporaryFile() as records:
+        offsets.write(_OFFSET.pack(0))
+        for event in events:
+            actor = event.driver if isinstance(event, DriverRequest) \
+                else event.rider
+            string = actor.identifier.encode()
+            length += len(string)
+            blob.write(string)
+            offsets.write(_OFFSET.pack(length))
+            records.write(_RECORD.pack(*_record(event, count)))
+            count += 1
+        blob.write(b"\0" * (-length % 4))
+
+        with open(filename, "wb") as file:
+            file.write(_HEADER.pack(_MAGIC, _BYTE_ORDERS[sys.byteorder],
+                                    count, count))
+            for spooled in [offsets, blob, records]:
+                spooled.seek(0)
+                shutil.copyfileobj(spooled, file)
+    return count
+
+
+def _record(event, identifier):
+    """Return the record of <event>, whose actor's identifier is at index
+    <identifier> in the string table.
+
+    @type event: DriverRequest | RiderRequest
+    @type identifier: int
+    @rtype: tuple[int]
+    """
+    if isinstance(event, DriverRequest):
+        driver = event.driver
+        return (event.timestamp, DRIVER_REQUEST, identifier,
+                driver.location.row, driver.location.column, 0, 0,
+                driver.speed)
+    rider = event.rider
+    return (event.timestamp, RIDER_REQUEST, identifier, rider.origin.row,
+            rider.origin.column, rider.destination.row,
+            rider.destination.column, rider.patience)
+
+
+def write_event_records(filename, identifiers, records):
+    """Write a binary event file to <filename> with the string table
+    <identifiers> and the flat array of event <records>.
+
+    @type filename: str
+    @type identifiers: list[str]
+    @type records: array[int]
+        RECORD_FIELDS int32 values per event, as described above.
+    @rtype: None
+    """
+    encoded = [identifier.encode() for identifier in identifiers]
+    offsets = array("I", [0])
+    for string in encoded:
+        offsets.append(offsets[-1] + len(string))
+    blob = b"".join(encoded)
+    with open(filename, "wb") as file:
+        file.write(_HEADER.pack(_MAGIC, _BYTE_ORDERS[sys.byteorder],
+                                len(encoded), len(records) // RECORD_FIELDS))
+        offsets.tofile(file)
+        file.write(blob)
+        file.write(b"\0" * (-len(blob) % 4))
+        records.tofile(file)
+
+
+def is_binary_event_file(filename):
+    """Return True iff <filename> starts like a binary event file.
+
+    @type filename: str
+    @rtype: bool
+    """
+    with open(filename, "rb") as file:
+        return file.read(len(_MAGIC)) == _MAGIC
+
+
+def load_binary_events(filename):
+    """Return a list of Events based on the binary event file <filename>.
+
+    @type filename: str
+    @rtype: list[Event]
+    """
+    return list(iter_binary_events(filename))
+
+
+def iter_binary_events(filename):
+    """Yield the Events in the binary event file <filename> one at a time.
+
+    Raise ValueError if <filename> is not a binary event file written on a
+    machine with the same byte order.
+
+    @type filename: str
+    @rtype: iterator[Event]
+
+    >>> import os, tempfile
+    >>> from event import create_event_list
+    >>> path = os.path.join(tempfile.mkdtemp(), "events.bin")
+    >>> convert_event_file("events.txt", path)
+    12
+    >>> [str(event) for event in iter_binary_events(path)] == \\
+    ...     [str(event) for event in create_event_list("events.txt")]
+    True
+    """
+    with open(filename, "rb") as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        magic, byte_order, string_count, record_count = \
+            _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("Not a binary event file: {}".format(filename))
+        if byte_order != _BYTE_ORDERS[sys.byteorder]:
+            raise ValueError("Binary event file has the wrong byte order: "
+                             "{}".format(filename))
+
+        view = memoryview(data)
+        start = _HEADER.size
+        end = start + 4 * (string_count + 1)
+        offsets = view[start:end].cast("I")
+        identifiers = [bytes(view[end + offsets[i]:end + offsets[i + 1]])
+                       .decode() for i in range(string_count)]
+        start = end + offsets[string_count]
+        start += -start % 4
+        offsets.release()
+        records = view[start:start + 4 * RECORD_FIELDS * record_count] \
+            .cast("i")
+        try:
+            for i in range(0, len(records), RECORD_FIELDS):
+                timestamp, kind, identifier, row, column, destination_row, \
+                    destination_column, value = records[i:i + RECORD_FIELDS]
+                if kind == DRIVER_REQUEST:
+                    yield DriverRequest(timestamp,
+                                        Driver(identifiers[identifier],
+                                               Location(row, column), value))
+                else:
+                    yield RiderRequest(timestamp,
+                                       Rider(identifiers[identifier],
+                                             Location(row, column),
+                                             Location(destination_row,
+                                                      destination_column),
+                                             WAITING, value))
+        finally:
+            records.release()
+            view.release()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python binary_events.py <events.txt> <events.bin>")
+    print("{} events written".format(convert_event_file(sys.argv[1],
+                                                        sys.argv[2])))
@@ -0,0 +1,303 @@
+"""
+The bulk_loader module contains a fast loader for large event files.
+
+The file is memory-mapped and parsed a chunk of lines at a time. Each chunk
+is tokenized with NumPy array operations on its bytes, and the numeric
+fields of every line are read into NumPy columns, so no Python code runs
+per line while loading. The Driver, Rider and Event objects, which cost far
+more to build than the file costs to parse, are only built when an event is
+taken from the EventColumns, so a simulation streaming them builds each
+event just before it is done.
+The loader produces the same events as event.create_event_list.
+
+=== Constants ===
+@type CHUNK_SIZE: int
+    The default number of bytes of the file parsed at a time.
+"""
+import mmap
+
+import numpy as np
+
+from driver import Driver
+from event import DriverRequest, RiderRequest
+from location import Location
+from rider import Rider, WAITING
+
+CHUNK_SIZE = 1 << 22
+
+# The number of events converted from NumPy to Python values at a time
+# while iterating.
+_BLOCK_SIZE = 4096
+
+
+class EventColumns:
+    """The events of an event file, stored as columns.
+
+    An EventColumns is a sequence of Events: indexing or iterating it
+    builds the events it holds. Each access builds new Event, Driver and
+    Rider objects, so take each event once, as Simulation.run does.
+
+    === Attributes ===
+    @type timestamps: numpy.ndarray
+        The timestamp of each event.
+    @type is_driver: numpy.ndarray
+        Whether each event is a DriverRequest, rather than a RiderRequest.
+    @type rows: numpy.ndarray
+    @type columns: numpy.ndarray
+        The location of the driver, or the origin of the rider, of each
+        event.
+    @type destination_rows: numpy.ndarray
+    @type destination_columns: numpy.ndarray
+        The destination of the rider of each event, or 0 for drivers.
+    @type values: numpy.ndarray
+        The speed of the driver, or the patience of the rider, of each
+        event.
+    """
+
+    # === Private Attributes ===
+    # @type _identifiers: bytes
+    #     The identifiers of all the events, one after another.
+    # @type _offsets: numpy.ndarray
+    #     The offset in _identifiers of the identifier of each event, and
+    #     the length of _identifiers at the end.
+
+    def __init__(self, fields, identifiers, offsets):
+        """Initialize an EventColumns.
+
+        @type self: EventColumns
+        @type fields: dict[str, numpy.ndarray]
+            Maps the name of each column attribute to the column.
+        @type identifiers: bytes
+        @type offsets: numpy.ndarray
+        @rtype: None
+        """
+        self.timestamps = fields["timestamps"]
+        self.is_driver = fields["is_driver"]
+        self.rows = fields["rows"]
+        self.columns = fields["columns"]
+        self.destination_rows = fields["destination_rows"]
+        self.destination_columns = fields["destination_columns"]
+        self.values = fields["values"]
+        self._identifiers = identifiers
+        self._offsets = offsets
+
+    def __len__(self):
+        """Return the number of events.
+
+        @type self: EventColumns
+        @rtype: int
+        """
+        return len(self.timestamps)
+
+    def __getitem__(self, index):
+        """Return a new Event for the event at <index>.
+
+        @type self: EventColumns
+        @type index: int
+        @rtype: Event
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("event index out of range")
+        return next(self._events(index, index + 1))
+
+    def __iter__(self):
+        """Yield a new Event for each event, in file order.
+
+        @type self: EventColumns
+        @rtype: iterator[Event]
+        """
+        for start in range(0, len(self), _BLOCK_SIZE):
+            yield from self._events(start, min(start + _BLOCK_SIZE,
+                                               len(self)))
+
+    def _events(self, start, end):
+        """Yield a new Event for each event from index <start> up to but not
+        including <end>.
+
+        @type self: EventColumns
+        @type start: int
+        @type end: int
+        @rtype: iterator[Event]
+        """
+        identifiers = self._identifiers
+        offsets = self._offsets[start:end + 1].tolist()
+        for (timestamp, is_driver, row, column, destination_row,
+             destination_column, value), identifier_start, identifier_end \
+                in zip(zip(*[column[start:end].tolist() for column in
+                            [self.timestamps, self.is_driver, self.rows,
+                             self.columns, self.destination_rows,
+                             self.destination_columns, self.values]]),
+                       offsets, offsets[1:]):
+            identifier = identifiers[identifier_start:identifier_end].decode()
+            if is_driver:
+                yield DriverRequest(timestamp, Driver(
+                    identifier, Location(row, column), value))
+            else:
+                yield RiderRequest(timestamp, Rider(
+                    identifier, Location(row, column),
+                    Location(destination_row, destination_column), WAITING,
+                    value))
+
+
+def load_event_columns(filename, chunk_size=CHUNK_SIZE):
+    """Return the events in <filename> as an EventColumns.
+
+    Precondition: the file stored at <filename> is in the format specified
+    by the assignment handout.
+
+    @type filename: str
+        The name of a file that contains the list of events.
+    @type chunk_size: int
+        The approximate number of bytes parsed at a time.
+    @rtype: EventColumns
+
+    >>> events = load_event_columns("events.txt", 64)
+    >>> len(events), events.timestamps[:8].tolist()
+    (12, [0, 0, 0, 0, 0, 0, 0, 5])
+    >>> print(events[0].driver.location, events[6].rider.destination)
+    1,1 5,5
+    """
+    # An empty file parses as a single empty chunk.
+    chunks = [_parse_chunk(chunk) for chunk in _chunks(filename, chunk_size)] \
+        or [_parse_chunk(b"")]
+    fields = {name: np.concatenate([chunk[0][name] for chunk in chunks])
+              for name in _FIELDS}
+    lengths = np.concatenate([chunk[2] for chunk in chunks])
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return EventColumns(fields, b"".join(chunk[1] for chunk in chunks),
+                        offsets)
+
+
+def load_event_list(filename, chunk_size=CHUNK_SIZE):
+    """Return a list of Events based on raw list of events in <filename>.
+
+    This builds every event at once; pass load_event_columns(filename) to
+    Simulation.run with stream=True to build each one only when needed.
+
+    Precondition: the file stored at <filename> is in the format specified
+    by the assignment handout.
+
+    @type filename: str
+        The name of a file that contains the list of events.
+    @type chunk_size: int
+        The approximate number of bytes parsed at a time.
+    @rtype: list[Event]
+
+    >>> from event import create_event_list
+    >>> [str(event) for event in load_event_list("events.txt", 64)] == \\
+    ...     [str(event) for event in create_event_list("events.txt")]
+    True
+    """
+    return list(load_event_columns(filename, chunk_size))
+
+
+def _chunks(filename, chunk_size):
+    """Yield the contents of <filename> in chunks of complete lines of
+    about <chunk_size> bytes.
+
+    @type filename: str
+    @type chunk_size: int
+    @rtype: iterator[bytes]
+    """
+    with open(filename, "rb") as file:
+        try:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # An empty file cannot be memory-mapped.
+            return
+        with data:
+            start = 0
+            while start < len(data):
+                end = min(start + chunk_size, len(data))
+                if end < len(data):
+                    newline = data.rfind(b"\n", start, end)
+                    if newline == -1:
+                        newline = data.find(b"\n", end)
+                    end = len(data) if newline == -1 else newline + 1
+                yield data[start:end]
+                start = end
+
+
+# The names of the numeric columns.
+_FIELDS = ["timestamps", "is_driver", "rows", "columns", "destination_rows",
+           "destination_columns", "values"]
+
+
+def _parse_chunk(chunk):
+    """Return the numeric columns of the events in <chunk>, a sequence of
+    complete lines of an event file, in the order they appear, with their
+    identifiers one after another and the length of each identifier.
+
+    @type chunk: bytes
+    @rtype: (dict[str, numpy.ndarray], bytes, numpy.ndarray)
+    """
+    if b"#" in chunk:
+        chunk = b"\n".join(line for line in chunk.split(b"\n")
+                           if not line.lstrip().startswith(b"#"))
+    data = np.frombuffer(chunk, dtype=np.uint8)
+    in_token = np.zeros(len(data) + 2, dtype=bool)
+    in_token[1:-1] = ~_SEPARATORS[data]
+    starts = np.flatnonzero(in_token[1:-1] & ~in_token[:-2])
+    ends = np.flatnonzero(in_token[1:-1] & ~in_token[2:]) + 1
+
+    # The first token of each line is its timestamp, and the next is its
+    # event type, which is told apart by its first letter.
+    lines = np.searchsorted(np.flatnonzero(data == ord("\n")), starts)
+    firsts = np.flatnonzero(np.diff(lines, prepend=-1) != 0)
+    is_driver = data[starts[firsts + 1]] == ord("D")
+    riders = firsts[~is_driver]
+
+    def integers(indices):
+        return _integers(data, starts[indices], ends[indices])
+
+    fields = {"timestamps": integers(firsts),
+              "is_driver": is_driver,
+              "rows": integers(firsts + 3),
+              "columns": integers(firsts + 4),
+              "destination_rows": np.zeros(len(firsts), dtype=np.int64),
+              "destination_columns": np.zeros(len(firsts), dtype=np.int64),
+              "values": integers(np.where(is_driver, firsts + 5,
+                                          firsts + 7))}
+    fields["destination_rows"][~is_driver] = integers(riders + 5)
+    fields["destination_columns"][~is_driver] = integers(riders + 6)
+
+    # Gather the bytes of every identifier into one string.
+    identifier_starts = starts[firsts + 2]
+    lengths = ends[firsts + 2] - identifier_starts
+    positions = np.arange(lengths.sum()) + np.repeat(
+        identifier_starts - (np.cumsum(lengths) - lengths), lengths)
+    return fields, data[positions].tobytes(), lengths
+
+
+def _integers(data, starts, ends):
+    """Return the tokens of <data> from each of <starts> up to each of
+    <ends>, read as non-negative decimal integers.
+
+    @type data: numpy.ndarray
+    @type starts: numpy.ndarray
+    @type ends: numpy.ndarray
+    @rtype: numpy.ndarray
+
+    >>> data = np.frombuffer(b"7 120,04", dtype=np.uint8)
+    >>> _integers(data, np.array([0, 2, 6]), np.array([1, 5, 8])).tolist()
+    [7, 120, 4]
+    """
+    if len(starts) == 0:
+        return np.zeros(0, dtype=np.int64)
+    width = int((ends - starts).max())
+    # Each row holds the positions of the digits of a token, from the last
+    # digit back, and the positions before the token read as zero.
+    positions = ends[:, None] - 1 - np.arange(width)
+    digits = data[np.maximum(positions, 0)].astype(np.int64) - ord("0")
+    digits[positions < starts[:, None]] = 0
+    return digits @ _POWERS[:width]
+
+
+# A table of which byte values separate tokens, and the powers of ten that
+# fit in an int64.
+_SEPARATORS = np.zeros(256, dtype=bool)
+_SEPARATORS[list(b" \t\r\n,")] = True
+_POWERS = 10 ** np.arange(19, dtype=np.int64)
@@ -0,0 +1,350 @@
+"""
+The checkpoint module contains the Checkpointer class, which periodically
+saves the state of a running simulation, and load_checkpoint, which reads a
+saved state back.
+
+The state of a simulation is kept in two files. The activity log,
+<filename>.<token>.log, holds a pickle of the travel time service in use
+and of the monitor as it was when the run started, followed by every
+activity the monitor has been notified of since, appended a batch at a
+time as the run goes. The checkpoint file, <filename>, holds a header with
+the length of the log at the checkpoint, and the zlib-compressed pickle of
+the name of the log and the open state of the simulation: its pending
+event queue, and its dispatcher with the registered drivers and waiting
+riders. The monitor is rebuilt on loading by notifying the logged monitor
+of the logged activities again, so the history of a run, which only grows,
+is written once rather than at every checkpoint.
+
+Pickling the open state is the only part done in the event loop, and its
+cost is bounded: a checkpoint is only saved once the run has notified an
+activity for every BYTES_PER_ACTIVITY bytes pickled for the last
+checkpoint, so the time spent pickling grows with the length of the run
+rather than with the number of checkpoints times the size of the history.
+Appending to the log, compressing and writing the checkpoint is done by a
+background thread, and each checkpoint file is replaced atomically after
+the log has been extended, so a crash while writing leaves the previous
+checkpoint intact. Each run starts a log under a new token, and the logs
+of earlier runs are only removed once a checkpoint of the new run has
+replaced the checkpoint file, so a run resumed with a checkpointer on the
+same file can crash before its first checkpoint and still be resumed
+again.
+
+Use simulation.resume to continue a run from a checkpoint.
+
+=== Constants ===
+@type BYTES_PER_ACTIVITY: int
+    The number of bytes of open state a checkpoint may pickle for every
+    activity notified since the last checkpoint.
+@type LOG_BATCH: int
+    The number of activities recorded before they are appended to the log,
+    even if no checkpoint is due.
+"""
+import os
+import pickle
+import re
+import struct
+import threading
+import zlib
+
+from location import Location
+from travel import get_travel_times
+
+BYTES_PER_ACTIVITY = 16
+LOG_BATCH = 1 << 14
+
+_MAGIC = b"SIMC"
+_LOG_MAGIC = b"SIML"
+_HEADER = struct.Struct("<4sIQ")
+_LOG_HEADER = struct.Struct("<4sI")
+_VERSION = 3
+
+
+class Checkpointer:
+    """Saves a checkpoint of a simulation whenever the simulated time has
+    advanced by <interval> since the last checkpoint, and the run has
+    notified enough activities to pay for it.
+
+    === Attributes ===
+    @type filename: str
+        The file the checkpoints are written to, each replacing the last.
+        The activity log is written next to it, to <filename>.<token>.log.
+    @type interval: int
+        The simulated time between checkpoints.
+    @type saved: int
+        The number of checkpoints saved.
+    @type pickled: int
+        The number of bytes pickled in the event loop for the checkpoints.
+    @type activities: int
+        The number of activities appended to the activity log.
+    """
+
+    # === Private Attributes ===
+    # @type _next_time: int | None
+    #     The timestamp from which the next checkpoint is due, or None
+    #     before the first event.
+    # @type _next_activities: int
+    #     The number of activities from which the next checkpoint is due.
+    # @type _recorder: _Recorder | None
+    #     The recorder of the activities not logged yet, once recording.
+    # @type _log_file: str | None
+    #     The name of the activity log of the run, once recording.
+    # @type _writer: threading.Thread | None
+    #     The thread writing the last checkpoint, if any.
+
+    def __init__(self, filename, interval):
+        """Initialize a Checkpointer.
+
+        @type self: Checkpointer
+        @type filename: str
+        @type interval: int
+            Precondition: interval > 0
+        @rtype: None
+        """
+        self.filename = filename
+        self.interval = interval
+        self.saved = 0
+        self.pickled = 0
+        self.activities = 0
+        self._next_time = None
+        self._next_activities = 0
+        self._recorder = None
+        self._log_file = None
+        self._writer = None
+
+    def record(self, monitor):
+        """Start a new activity log with the travel time service in use and
+        the state of <monitor>, and return a monitor to notify instead of
+        <monitor>, which notifies <monitor> and records the activities for
+        the log.
+
+        The checkpoint file and its log, if any, are kept until the first
+        checkpoint with the new log replaces them.
+
+        @type self: Checkpointer
+        @type monitor: Monitor
+        @rtype: _Recorder
+        """
+        self.wait()
+        self._log_file = "{}.{}.log".format(self.filename,
+                                            os.urandom(8).hex())
+        with open(self._log_file, "wb") as file:
+            file.write(_LOG_HEADER.pack(_LOG_MAGIC, _VERSION))
+            pickle.dump(get_travel_times(), file, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(monitor, file, pickle.HIGHEST_PROTOCOL)
+        self._recorder = _Recorder(monitor)
+        return self._recorder
+
+    def reached(self, simulation, timestamp, pulled=None, next_initial=None):
+        """Save a checkpoint of <simulation>, which has done every event up
+        to one at <timestamp>, if one is due.
+
+        @type self: Checkpointer
+        @type simulation: Simulation
+        @type timestamp: int
+        @type pulled: int | None
+            The number of initial events pulled from the stream so far, or
+            None if the initial events are not streamed.
+        @type next_initial: Event | None
+            The initial event pulled but not done yet, when streaming.
+        @rtype: None
+
+        >>> import tempfile
+        >>> from simulation import Simulation
+        >>> from workload import Workload
+        >>> checkpointer = Checkpointer(
+        ...     os.path.join(tempfile.mkdtemp(), "checkpoint"), 1)
+        >>> report = Simulation(checkpointer=checkpointer).run(
+        ...     Workload(10000), stream=True)
+        >>> checkpointer.saved > 10
+        True
+        >>> checkpointer.pickled / checkpointer.activities < \\
+        ...     2 * BYTES_PER_ACTIVITY
+        True
+        """
+        if self._next_time is None:
+            self._next_time = timestamp + self.interval
+        elif timestamp >= self._next_time and \
+                self.activities + len(self._recorder.records) >= \
+                self._next_activities:
+            self._next_time = timestamp + self.interval
+            self.save(simulation, pulled, next_initial)
+        elif len(self._recorder.records) >= LOG_BATCH:
+            self._log(None)
+
+    def save(self, simulation, pulled=None, next_initial=None):
+        """Pickle the open state of <simulation> and start logging the new
+        activities and writing the state to the checkpoint file in the
+        background.
+
+        Precondition: the activities of <simulation> are being recorded.
+
+        @type self: Checkpointer
+        @type simulation: Simulation
+        @type pulled: int | None
+        @type next_initial: Event | None
+        @rtype: None
+        """
+        data = pickle.dumps({"simulation": simulation, "pulled": pulled,
+                             "next_initial": next_initial,
+                             "log": os.path.basename(self._log_file)},
+                            pickle.HIGHEST_PROTOCOL)
+        self._log(data)
+        self.pickled += len(data)
+        self._next_activities = self.activities + \
+            len(data) // BYTES_PER_ACTIVITY
+        self.saved += 1
+
+    def _log(self, data):
+        """Start appending the recorded activities to the activity log in
+        the background, followed by writing the pickled state <data>, if
+        any, to the checkpoint file.
+
+        @type self: Checkpointer
+        @type data: bytes | None
+        @rtype: None
+        """
+        records = self._recorder.records
+        self._recorder.records = []
+        self.activities += len(records)
+        self.wait()
+        self._writer = threading.Thread(
+            target=_write,
+            args=(self.filename, self._log_file, records, data))
+        self._writer.start()
+
+    def wait(self):
+        """Wait until the last checkpoint has been written.
+
+        @type self: Checkpointer
+        @rtype: None
+        """
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+
+
+class _Recorder:
+    """A monitor that notifies another monitor of each activity, and
+    records the activities and the closing of actors, in order.
+
+    === Attributes ===
+    @type monitor: Monitor
+        The monitor notified.
+    @type records: list[tuple]
+        The arguments of each call to notify and close not logged yet, with
+        the row and column of each location in place of the location.
+    """
+
+    def __init__(self, monitor):
+        """Initialize a _Recorder for <monitor>.
+
+        @type self: _Recorder
+        @type monitor: Monitor
+        @rtype: None
+        """
+        self.monitor = monitor
+        self.records = []
+
+    def notify(self, timestamp, category, description, identifier, location):
+        """Notify the monitor of the activity and record it.
+
+        @type self: _Recorder
+        @type timestamp: int
+        @type category: DRIVER | RIDER
+        @type description: REQUEST | CANCEL | PICKUP | DROP_OFF
+        @type identifier: str
+        @type location: Location
+        @rtype: None
+        """
+        self.monitor.notify(timestamp, category, description, identifier,
+                            location)
+        self.records.append((timestamp, category, description, identifier,
+                             location.row, location.column))
+
+    def close(self, category, identifier):
+        """Tell the monitor that the actor will have no more activities, and
+        record it.
+
+        @type self: _Recorder
+        @type category: DRIVER | RIDER
+        @type identifier: str
+        @rtype: None
+        """
+        self.monitor.close(category, identifier)
+        self.records.append((category, identifier))
+
+
+def _write(filename, log, records, data):
+    """Append <records> to the activity log <log>, then, if <data> is not
+    None, compress it and write it to the checkpoint file <filename>,
+    replacing it atomically, and remove the other logs of <filename>.
+
+    @type filename: str
+    @type log: str
+    @type records: list[tuple]
+    @type data: bytes | None
+    @rtype: None
+    """
+    with open(log, "ab") as file:
+        if records:
+            pickle.dump(records, file, pickle.HIGHEST_PROTOCOL)
+        if data is None:
+            return
+        file.flush()
+        os.fsync(file.fileno())
+        log_size = file.tell()
+    temporary = filename + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(_HEADER.pack(_MAGIC, _VERSION, log_size))
+        file.write(zlib.compress(data, 1))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, filename)
+
+    directory, name = os.path.split(filename)
+    pattern = re.compile(re.escape(name) + r"\.[0-9a-f]{16}\.log")
+    for other in os.listdir(directory or "."):
+        if pattern.fullmatch(other) and other != os.path.basename(log):
+            os.remove(os.path.join(directory, other))
+
+
+def load_checkpoint(filename):
+    """Return the state saved to the checkpoint file <filename>: a dict
+    with the simulation, without its monitor, under "simulation", the
+    monitor rebuilt from the activity log under "monitor", the travel time
+    service the run used under "travel_times", and the number of initial
+    events pulled and the next initial event under "pulled" and
+    "next_initial".
+
+    Raise ValueError if <filename> or its activity log is not a checkpoint
+    file of this version.
+
+    @type filename: str
+    @rtype: dict[str, object]
+    """
+    with open(filename, "rb") as file:
+        header = file.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError("Not a checkpoint file: {}".format(filename))
+        magic, version, log_size = _HEADER.unpack(header)
+        if (magic, version) != (_MAGIC, _VERSION):
+            raise ValueError("Not a checkpoint file: {}".format(filename))
+        state = pickle.loads(zlib.decompress(file.read()))
+    log = os.path.join(os.path.dirname(filename), state.pop("log"))
+    with open(log, "rb") as file:
+        header = file.read(_LOG_HEADER.size)
+        if len(header) < _LOG_HEADER.size or \
+                _LOG_HEADER.unpack(header) != (_LOG_MAGIC, _VERSION):
+            raise ValueError("Not an activity log: {}".format(log))
+        travel_times = pickle.load(file)
+        monitor = pickle.load(file)
+        while file.tell() < log_size:
+            for record in pickle.load(file):
+                if len(record) == 2:
+                    monitor.close(*record)
+                else:
+                    monitor.notify(*record[:4],
+                                   Location(record[4], record[5]))
+    state["monitor"] = monitor
+    state["travel_times"] = travel_times
+    return state
@@ -0,0 +1,259 @@
+"""
+The columnar_monitor module contains the ColumnarMonitor class, a monitor
+that keeps the full activity history in compact columns, and functions to
+export the columns to .npy files and load them back memory-mapped.
+"""
+import os
+from array import array
+
+import numpy as np
+
+from location import Location
+from monitor import Monitor, RIDER, DRIVER, REQUEST, CANCEL, PICKUP, DROPOFF
+from travel import distance, get_travel_times
+
+# The codes stored in the category and description columns.
+CATEGORIES = [RIDER, DRIVER]
+DESCRIPTIONS = [REQUEST, CANCEL, PICKUP, DROPOFF]
+
+# The columns of the activity log and the typecode of each column.
+COLUMNS = [("timestamp", "q"), ("category", "b"), ("description", "b"),
+           ("identifier", "q"), ("row", "q"), ("column", "q")]
+
+
+class ColumnarMonitor(Monitor):
+    """A monitor that records every activity it is notified about in a
+    columnar log.
+
+    Each activity is a row of six columns, each a compact array: timestamp,
+    category code, description code, interned identifier, row and column.
+    report() computes the same statistics as Monitor with NumPy group-by
+    operations over the columns, and export() saves the columns so that
+    they can be analysed later without loading the whole log into memory.
+    """
+
+    # === Private Attributes ===
+    # @type _columns: dict[str, array]
+    #     Maps the name of each column to its values, one per activity, in
+    #     the order the activities were notified.
+    # @type _identifiers: list[str]
+    #     The interned identifiers, indexed by the identifier column.
+    # @type _codes: dict[str, int]
+    #     Maps each identifier to its index in _identifiers.
+
+    def __init__(self):
+        """Initialize a ColumnarMonitor.
+
+        @type self: ColumnarMonitor
+        """
+        self._columns = {name: array(typecode) for name, typecode in COLUMNS}
+        self._identifiers = []
+        self._codes = {}
+
+    def __str__(self):
+        """Return a string representation.
+
+        @type self: ColumnarMonitor
+        @rtype: str
+        """
+        categories = self._view("category")
+        identifiers = self._view("identifier")
+        return "Monitor ({} drivers, {} riders)".format(
+            len(np.unique(identifiers[categories == CATEGORIES.index(DRIVER)])),
+            len(np.unique(identifiers[categories == CATEGORIES.index(RIDER)])))
+
+    def notify(self, timestamp, category, description, identifier, location):
+        """Notify the monitor of the activity.
+
+        @type self: ColumnarMonitor
+        @type timestamp: int
+            The time of the activity.
+        @type category: DRIVER | RIDER
+            The category for the activity.
+        @type description: REQUEST | CANCEL | PICKUP | DROP_OFF
+            A description of the activity.
+        @type identifier: str
+            The identifier for the actor.
+        @type location: Location
+            The location of the activity.
+        @rtype: None
+        """
+        code = self._codes.get(identifier)
+        if code is None:
+            code = len(self._identifiers)
+            self._codes[identifier] = code
+            self._identifiers.append(identifier)
+        columns = self._columns
+        columns["timestamp"].append(timestamp)
+        columns["category"].append(CATEGORIES.index(category))
+        columns["description"].append(DESCRIPTIONS.index(description))
+        columns["identifier"].append(code)
+        columns["row"].append(location.row)
+        columns["column"].append(location.column)
+
+    def column(self, name):
+        """Return a copy of the column <name> as a NumPy array.
+
+        The copy does not change when the monitor is notified of more
+        activities.
+
+        @type self: ColumnarMonitor
+        @type name: str
+        @rtype: numpy.ndarray
+
+        >>> from location import Location
+        >>> monitor = ColumnarMonitor()
+        >>> monitor.notify(0, DRIVER, REQUEST, "Amaranth", Location(1, 1))
+        >>> rows = monitor.column("row")
+        >>> monitor.notify(2, DRIVER, PICKUP, "Amaranth", Location(3, 1))
+        >>> rows.tolist(), monitor.column("row").tolist()
+        ([1], [1, 3])
+        """
+        return np.array(self._view(name))
+
+    def _view(self, name):
+        """Return the column <name> as a NumPy array, without copying it.
+
+        An array's buffer cannot grow while a view of it exists, so the
+        view must not be kept beyond the method that asked for it.
+
+        @type self: ColumnarMonitor
+        @type name: str
+        @rtype: numpy.ndarray
+        """
+        return np.frombuffer(self._columns[name],
+                             dtype=self._columns[name].typecode)
+
+    def identifiers(self):
+        """Return the interned identifiers, indexed by the identifier column.
+
+        @type self: ColumnarMonitor
+        @rtype: list[str]
+        """
+        return list(self._identifiers)
+
+    def export(self, directory):
+        """Save each column to <directory>/<name>.npy, and the interned
+        identifiers to <directory>/identifiers.npy.
+
+        @type self: ColumnarMonitor
+        @type directory: str
+        @rtype: None
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name, _ in COLUMNS:
+            np.save(os.path.join(directory, name + ".npy"), self._view(name))
+        np.save(os.path.join(directory, "identifiers.npy"),
+                np.array(self._identifiers, dtype=str))
+
+    def _activities_of(self, category):
+        """Return the activities in <category>, grouped by identifier.
+
+        Return the descriptions, rows and columns of the activities sorted
+        by identifier and then by notification order, the position of each
+        activity within its identifier's activities, and the number of
+        activities of the identifier each activity belongs to.
+
+        @type self: ColumnarMonitor
+        @type category: DRIVER | RIDER
+        @rtype: dict[str, numpy.ndarray]
+        """
+        selected = np.flatnonzero(self._view("category") ==
+                                  CATEGORIES.index(category))
+        identifiers = self._view("identifier")[selected]
+        order = selected[np.argsort(identifiers, kind="stable")]
+        identifiers = self._view("identifier")[order]
+        starts = np.flatnonzero(np.diff(identifiers, prepend=-1) != 0)
+        sizes = np.diff(np.append(starts, len(order)))
+        group_starts = np.repeat(starts, sizes)
+        return {"timestamp": self._view("timestamp")[order],
+                "description": self._view("description")[order],
+                "row": self._view("row")[order],
+                "column": self._view("column")[order],
+                "position": np.arange(len(order)) - group_starts,
+                "size": np.repeat(sizes, sizes)}
+
+    def _average_wait_time(self):
+        """Return the average wait time of riders that have either been picked
+        up or have cancelled their ride.
+
+        @type self: ColumnarMonitor
+        @rtype: float
+        """
+        riders = self._activities_of(RIDER)
+        first = np.flatnonzero((riders["position"] == 0) & (riders["size"] >= 2))
+        wait_time = riders["timestamp"][first + 1] - riders["timestamp"][first]
+        return int(wait_time.sum()) / len(first)
+
+    def _average_total_distance(self):
+        """Return the average distance drivers have driven.
+
+        @type self: ColumnarMonitor
+        @rtype: float
+        """
+        drivers = self._activities_of(DRIVER)
+        steps = _steps(drivers)
+        # Only drivers with two or three activities count, over all of the
+        # steps between their activities.
+        counted = (drivers["size"][1:] >= 2) & (drivers["size"][1:] <= 3) & \
+            (drivers["position"][1:] > 0)
+        count = int(np.count_nonzero((drivers["position"] == 0) &
+                                     (drivers["size"] >= 2) &
+                                     (drivers["size"] <= 3)))
+        return int(steps[counted].sum()) / count
+
+    def _average_ride_distance(self):
+        """Return the average distance drivers have driven on rides.
+
+        @type self: ColumnarMonitor
+        @rtype: float
+        """
+        drivers = self._activities_of(DRIVER)
+        pickups = drivers["description"] == DESCRIPTIONS.index(PICKUP)
+        if np.any(pickups & (drivers["position"] == drivers["size"] - 1)):
+            raise IndexError("A driver's last activity is a pickup")
+        steps = _steps(drivers)
+        rides = steps[pickups[:-1]]
+        return int(rides.sum()) / len(rides)
+
+
+def _steps(activities):
+    """Return the distance between each activity in <activities> and the
+    next one, according to the travel time service in use.
+
+    @type activities: dict[str, numpy.ndarray]
+    @rtype: numpy.ndarray
+    """
+    if get_travel_times().manhattan:
+        return np.abs(np.diff(activities["row"])) + \
+            np.abs(np.diff(activities["column"]))
+    locations = [Location(row, column) for row, column in
+                 zip(activities["row"].tolist(),
+                     activities["column"].tolist())]
+    return np.array([distance(origin, destination) for origin, destination
+                     in zip(locations, locations[1:])], dtype=np.int64)
+
+
+def load_columns(directory, mmap_mode="r"):
+    """Return the columns saved to <directory> by ColumnarMonitor.export,
+    memory-mapped with <mmap_mode>, and the interned identifiers.
+
+    @type directory: str
+    @type mmap_mode: str | None
+    @rtype: (dict[str, numpy.ndarray], list[str])
+
+    >>> import tempfile
+    >>> from location import Location
+    >>> monitor = ColumnarMonitor()
+    >>> monitor.notify(3, RIDER, REQUEST, "Almond", Location(1, 1))
+    >>> directory = tempfile.mkdtemp()
+    >>> monitor.export(directory)
+    >>> columns, identifiers = load_columns(directory)
+    >>> columns["timestamp"].tolist(), identifiers
+    ([3], ['Almond'])
+    """
+    columns = {name: np.load(os.path.join(directory, name + ".npy"),
+                             mmap_mode=mmap_mode)
+               for name, _ in COLUMNS}
+    identifiers = np.load(os.path.join(directory, "identifiers.npy")).tolist()
+    return columns, identifiers
@@ -1,3 +1,7 @@
+from collections import OrderedDict, deque
+from heapq import heappush, heappop, heapify
+
+
 class Container:
     """A container that holds objects.
 
@@ -47,12 +51,16 @@ class PriorityQueue(Container):
     """
 
     # === Private Attributes ===
-    # @type _items: list
-    #     The items stored in the priority queue.
+    # @type _items: list[(object, int)]
+    #     A binary min-heap of (item, sequence number) pairs.
+    # @type _count: int
+    #     The sequence number given to the next item added to the queue.
     #
     # === Representation Invariants ===
-    # _items is a sorted list, where the first item in the queue is the
-    # item with the highest priority.
+    # _items satisfies the heap invariant of the heapq module, so
+    # _items[0] is the pair holding the item with the highest priority.
+    # Sequence numbers are unique and increase in insertion order, so
+    # items that compare equal are removed in FIFO order.
 
     def __init__(self):
         """Initialize an empty PriorityQueue.
@@ -61,6 +69,20 @@ class PriorityQueue(Container):
         @rtype: None
         """
         self._items = []
+        self._count = 0
+
+    def __len__(self):
+        """Return the number of items in this PriorityQueue.
+
+        @type self: PriorityQueue
+        @rtype: int
+
+        >>> pq = PriorityQueue()
+        >>> pq.extend(["red", "blue"])
+        >>> len(pq)
+        2
+        """
+        return len(self._items)
 
     def remove(self):
         """Remove and return the next item from this PriorityQueue.
@@ -84,7 +106,24 @@ class PriorityQueue(Container):
         >>> pq.remove()
         'yellow'
         """
-        return self._items.pop(0)
+        return heappop(self._items)[0]
+
+    def peek(self):
+        """Return the next item from this PriorityQueue without removing it.
+
+        Precondition: <self> should not be empty.
+
+        @type self: PriorityQueue
+        @rtype: object
+
+        >>> pq = PriorityQueue()
+        >>> pq.extend(["red", "blue"])
+        >>> pq.peek()
+        'blue'
+        >>> len(pq)
+        2
+        """
+        return self._items[0][0]
 
     def is_empty(self):
         """
@@ -114,9 +153,444 @@ class PriorityQueue(Container):
         >>> pq.add("blue")
         >>> pq.add("red")
         >>> pq.add("green")
-        >>> pq.items
+        >>> [pq.remove() for _ in range(4)]
         ['blue', 'green', 'red', 'yellow']
         """
-        self._items.append(item)
-        self._items.sort()
+        heappush(self._items, (item, self._count))
+        self._count += 1
+
+    def remove_ties(self):
+        """Remove and return the next item of this PriorityQueue and every
+        item tied with it, in the order remove() would return them.
+
+        Precondition: <self> should not be empty.
+
+        @type self: PriorityQueue
+        @rtype: list[object]
+
+        >>> pq = PriorityQueue()
+        >>> pq.extend(["red", "blue", "green", "blue"])
+        >>> pq.remove_ties()
+        ['blue', 'blue']
+        >>> pq.remove_ties()
+        ['green']
+        """
+        items = self._items
+        first = heappop(items)[0]
+        tied = [first]
+        while items and not first < items[0][0]:
+            tied.append(heappop(items)[0])
+        return tied
+
+    def extend(self, items):
+        """Add every item in <items> to this PriorityQueue.
+
+        Items are added in iteration order, so ties among them (and with
+        items already in the queue) are still resolved in FIFO order. When
+        pushing the items one at a time would take longer, the heap is
+        rebuilt once in linear time instead.
+
+        @type self: PriorityQueue
+        @type items: iterable[object]
+        @rtype: None
+
+        >>> pq = PriorityQueue()
+        >>> pq.add("red")
+        >>> pq.extend(["yellow", "blue", "green"])
+        >>> [pq.remove() for _ in range(4)]
+        ['blue', 'green', 'red', 'yellow']
+        """
+        heap = self._items
+        entries = [(item, self._count + i) for i, item in enumerate(items)]
+        self._count += len(entries)
+        if len(entries) * len(heap).bit_length() < len(heap):
+            for entry in entries:
+                heappush(heap, entry)
+        else:
+            heap.extend(entries)
+            heapify(heap)
+
+    def compact(self, is_dead, min_ratio=0.0):
+        """Remove every item for which <is_dead> returns True, as long as at
+        least <min_ratio> of the items in this PriorityQueue are dead.
+
+        Return the number of items removed. The remaining items keep their
+        order, including the FIFO order of ties.
+
+        @type self: PriorityQueue
+        @type is_dead: (object) -> bool
+        @type min_ratio: float
+        @rtype: int
+
+        >>> pq = PriorityQueue()
+        >>> pq.extend(["red", "blue", "yellow", "green"])
+        >>> pq.compact(lambda item: item.startswith("g"), 0.5)
+        0
+        >>> pq.compact(lambda item: item.startswith("g"))
+        1
+        >>> [pq.remove() for _ in range(3)]
+        ['blue', 'red', 'yellow']
+        """
+        live = [entry for entry in self._items if not is_dead(entry[0])]
+        removed = len(self._items) - len(live)
+        if removed == 0 or removed < min_ratio * len(self._items):
+            return 0
+        heapify(live)
+        self._items = live
+        return removed
+
+
+class WaitingList(Container):
+    """A first-in, first-out list of riders waiting for a driver.
+
+    Riders are removed in the order they were added, and any rider can also
+    be removed directly when they cancel. Adding, removing the oldest rider
+    and removing a given rider all take constant time.
+
+    Each rider may only be in the WaitingList once at a time.
+    """
+
+    # === Private Attributes ===
+    # @type _riders: OrderedDict[str, (Rider, int | None)]
+    #     Maps the identifier of each waiting rider to the rider and the time
+    #     they were added, oldest rider first.
+
+    def __init__(self):
+        """Initialize an empty WaitingList.
+
+        @type self: WaitingList
+        @rtype: None
+        """
+        self._riders = OrderedDict()
+
+    def __len__(self):
+        """Return the number of riders in this WaitingList.
+
+        @type self: WaitingList
+        @rtype: int
+        """
+        return len(self._riders)
+
+    def __contains__(self, rider):
+        """Return True iff <rider> is in this WaitingList.
+
+        @type self: WaitingList
+        @type rider: Rider
+        @rtype: bool
+        """
+        return rider.identifier in self._riders
+
+    def add(self, rider, timestamp=None):
+        """Add <rider> to the end of this WaitingList.
+
+        @type self: WaitingList
+        @type rider: Rider
+        @type timestamp: int | None
+            The time the rider started waiting, if known.
+        @rtype: None
+        """
+        self._riders[rider.identifier] = (rider, timestamp)
+
+    def remove(self):
+        """Remove and return the rider who has been waiting the longest.
+
+        Precondition: <self> should not be empty.
+
+        @type self: WaitingList
+        @rtype: Rider
+
+        >>> from rider import Rider, WAITING
+        >>> waiting = WaitingList()
+        >>> for name in ["Almond", "Bisque", "Cerise"]:
+        ...     waiting.add(Rider(name, None, None, WAITING, 5))
+        >>> waiting.discard(Rider("Bisque", None, None, WAITING, 5))
+        >>> print(waiting.remove(), waiting.remove())
+        Almond Cerise
+        """
+        return self._riders.popitem(last=False)[1][0]
+
+    def discard(self, rider):
+        """Remove <rider> from this WaitingList if they are in it.
+
+        @type self: WaitingList
+        @type rider: Rider
+        @rtype: None
+        """
+        self._riders.pop(rider.identifier, None)
+
+    def is_empty(self):
+        """Return True iff this WaitingList is empty.
+
+        @type self: WaitingList
+        @rtype: bool
+        """
+        return not self._riders
+
+    def riders(self):
+        """Return the riders in this WaitingList, oldest first.
+
+        @type self: WaitingList
+        @rtype: list[Rider]
+        """
+        return [rider for rider, _ in self._riders.values()]
+
+    def oldest(self):
+        """Return the rider who has been waiting the longest and the time
+        they were added, or None if this WaitingList is empty.
+
+        @type self: WaitingList
+        @rtype: (Rider, int | None) | None
+        """
+        for entry in self._riders.values():
+            return entry
+        return None
+
+
+class CalendarQueue(Container):
+    """A queue of timestamped items that operates in timestamp order.
+
+    Items must have an integer <timestamp> attribute. The item with the
+    smallest timestamp is removed first, and ties are resolved in FIFO
+    order, so for Events this removes items in the same order as a
+    PriorityQueue.
+
+    Items are bucketed by timestamp in a ring of <width> buckets covering
+    the timestamps [base, base + width). Adding and removing an item is O(1)
+    amortized as long as items are scheduled less than <width> time units
+    after the earliest item in the queue; items further in the future are
+    kept in an overflow heap until the ring reaches them.
+    """
+
+    # === Private Attributes ===
+    # @type _width: int
+    #     The number of buckets in the ring.
+    # @type _buckets: list[deque[(int, int, object)]]
+    #     The ring of buckets. Bucket t % _width holds the entries with
+    #     timestamp t, for base <= t < base + _width.
+    # @type _base: int
+    #     The smallest timestamp that may be stored in the ring.
+    # @type _ring_size: int
+    #     The number of entries stored in the ring.
+    # @type _overflow: list[(int, int, object)]
+    #     A min-heap of the entries whose timestamp is >= _base + _width.
+    # @type _count: int
+    #     The sequence number given to the next item added to the queue.
+    #
+    # === Representation Invariants ===
+    # Every entry is a (timestamp, sequence number, item) triple.
+    # Every bucket holds entries of a single timestamp in increasing
+    # sequence number order.
+    # No timestamp in _overflow is less than _base + _width.
+
+    def __init__(self, width=1024):
+        """Initialize an empty CalendarQueue.
+
+        @type self: CalendarQueue
+        @type width: int
+            The number of buckets in the ring.
+            Precondition: width > 0
+        @rtype: None
+        """
+        self._width = width
+        self._buckets = [deque() for _ in range(width)]
+        self._base = 0
+        self._ring_size = 0
+        self._overflow = []
+        self._count = 0
+
+    def __len__(self):
+        """Return the number of items in this CalendarQueue.
 
+        @type self: CalendarQueue
+        @rtype: int
+        """
+        return self._ring_size + len(self._overflow)
+
+    def is_empty(self):
+        """Return True iff this CalendarQueue is empty.
+
+        @type self: CalendarQueue
+        @rtype: bool
+
+        >>> from event import Event
+        >>> cq = CalendarQueue()
+        >>> cq.is_empty()
+        True
+        >>> cq.add(Event(3))
+        >>> cq.is_empty()
+        False
+        """
+        return self._ring_size == 0 and not self._overflow
+
+    def add(self, item):
+        """Add <item> to this CalendarQueue.
+
+        @type self: CalendarQueue
+        @type item: object
+        @rtype: None
+
+        >>> from event import Event
+        >>> cq = CalendarQueue(4)
+        >>> for timestamp in [9, 2, 30, 2, 5]:
+        ...     cq.add(Event(timestamp))
+        >>> [cq.remove().timestamp for _ in range(5)]
+        [2, 2, 5, 9, 30]
+        """
+        timestamp = item.timestamp
+        if timestamp < self._base:
+            self._rebase(timestamp)
+        entry = (timestamp, self._count, item)
+        self._count += 1
+        if timestamp < self._base + self._width:
+            self._buckets[timestamp % self._width].append(entry)
+            self._ring_size += 1
+        else:
+            heappush(self._overflow, entry)
+
+    def extend(self, items):
+        """Add every item in <items> to this CalendarQueue.
+
+        @type self: CalendarQueue
+        @type items: iterable[object]
+        @rtype: None
+        """
+        for item in items:
+            self.add(item)
+
+    def remove(self):
+        """Remove and return the item with the smallest timestamp.
+
+        Precondition: <self> should not be empty.
+
+        @type self: CalendarQueue
+        @rtype: object
+
+        >>> from event import Event
+        >>> cq = CalendarQueue(2)
+        >>> first, second = Event(7), Event(7)
+        >>> cq.add(Event(9))
+        >>> cq.add(first)
+        >>> cq.add(second)
+        >>> cq.remove() is first
+        True
+        >>> cq.remove() is second
+        True
+        >>> cq.remove().timestamp
+        9
+        """
+        bucket = self._front()
+        self._ring_size -= 1
+        return bucket.popleft()[2]
+
+    def remove_ties(self):
+        """Remove and return every item with the smallest timestamp, in the
+        order remove() would return them.
+
+        Precondition: <self> should not be empty.
+
+        @type self: CalendarQueue
+        @rtype: list[object]
+
+        >>> from event import Event
+        >>> cq = CalendarQueue(4)
+        >>> for timestamp in [9, 2, 30, 2]:
+        ...     cq.add(Event(timestamp))
+        >>> [event.timestamp for event in cq.remove_ties()]
+        [2, 2]
+        """
+        bucket = self._front()
+        self._ring_size -= len(bucket)
+        tied = [entry[2] for entry in bucket]
+        bucket.clear()
+        return tied
+
+    def peek(self):
+        """Return the item with the smallest timestamp without removing it.
+
+        Precondition: <self> should not be empty.
+
+        @type self: CalendarQueue
+        @rtype: object
+        """
+        return self._front()[0][2]
+
+    def _front(self):
+        """Advance the ring to the first non-empty bucket and return it.
+
+        Precondition: <self> should not be empty.
+
+        @type self: CalendarQueue
+        @rtype: deque[(int, int, object)]
+        """
+        if self._ring_size == 0:
+            self._base = self._overflow[0][0]
+            self._migrate()
+        bucket = self._buckets[self._base % self._width]
+        while not bucket:
+            self._base += 1
+            bucket = self._buckets[self._base % self._width]
+        self._migrate()
+        return bucket
+
+    def compact(self, is_dead, min_ratio=0.0):
+        """Remove every item for which <is_dead> returns True, as long as at
+        least <min_ratio> of the items in this CalendarQueue are dead.
+
+        Return the number of items removed. The remaining items keep their
+        order, including the FIFO order of ties.
+
+        @type self: CalendarQueue
+        @type is_dead: (object) -> bool
+        @type min_ratio: float
+        @rtype: int
+        """
+        dead = 0
+        for bucket in self._buckets:
+            for entry in bucket:
+                if is_dead(entry[2]):
+                    dead += 1
+        for entry in self._overflow:
+            if is_dead(entry[2]):
+                dead += 1
+        if dead == 0 or dead < min_ratio * len(self):
+            return 0
+        for i in range(self._width):
+            if self._buckets[i]:
+                self._buckets[i] = deque(entry for entry in self._buckets[i]
+                                         if not is_dead(entry[2]))
+        self._overflow = [entry for entry in self._overflow
+                          if not is_dead(entry[2])]
+        heapify(self._overflow)
+        self._ring_size = sum(len(bucket) for bucket in self._buckets)
+        return dead
+
+    def _migrate(self):
+        """Move the overflow entries that now fall inside the ring into
+        their buckets.
+
+        @type self: CalendarQueue
+        @rtype: None
+        """
+        end = self._base + self._width
+        overflow = self._overflow
+        while overflow and overflow[0][0] < end:
+            entry = heappop(overflow)
+            self._buckets[entry[0] % self._width].append(entry)
+            self._ring_size += 1
+
+    def _rebase(self, timestamp):
+        """Move the start of the ring back to <timestamp>.
+
+        This only happens when an item is added with a timestamp earlier
+        than every timestamp the ring can hold.
+
+        @type self: CalendarQueue
+        @type timestamp: int
+        @rtype: None
+        """
+        for bucket in self._buckets:
+            while bucket:
+                heappush(self._overflow, bucket.popleft())
+        self._ring_size = 0
+        self._base = timestamp
+        self._migrate()
@@ -1,6 +1,14 @@
 from driver import Driver
-from rider import Rider
-from location import manhattan_distance
+from rider import Rider, CANCELLED
+from assignment import min_cost_assignment
+from container import WaitingList
+from spatial_index import DriverIndex
+from travel import distance
+
+# The largest number of riders and of drivers matched optimally at once by
+# match_batch; batches with more of either are matched greedily.
+MAX_OPTIMAL_BATCH = 100
+
 
 class Dispatcher:
     """A dispatcher fulfills requests from riders and drivers for a
@@ -16,16 +24,44 @@ class Dispatcher:
     the dispatcher does nothing. Once a driver requests a rider, the driver
     is registered with the dispatcher, and will be used to fulfill future
     rider requests.
+
+    In batch mode, requests are never fulfilled immediately: riders are
+    always placed on the waiting list, and match_batch is called once all
+    the requests at a timestamp have been made to match the waiting riders
+    with the idle drivers all at once.
+
+    === Attributes ===
+    @type rider_waiting_list: WaitingList
+        The riders waiting for a driver, oldest request first.
+    @type available_drivers: dict[str, Driver]
+        The registered drivers, keyed by identifier.
+    @type batch: bool
+        True iff this dispatcher is in batch mode.
     """
 
-    def __init__(self):
+    # === Private Attributes ===
+    # @type _idle_drivers: DriverIndex | Fleet
+    #     An index of the registered drivers that tracks which are idle,
+    #     used to find the closest idle driver to a rider and to count idle
+    #     drivers.
+
+    def __init__(self, idle_drivers=None, batch=False):
         """Initialize a Dispatcher.
 
         @type self: Dispatcher
+        @type idle_drivers: DriverIndex | Fleet | None
+            The empty index used to find idle drivers, such as a Fleet. A
+            DriverIndex is used if this is None.
+        @type batch: bool
+            Whether the dispatcher is in batch mode.
         @rtype: None
         """
-        self.rider_waiting_list = []
-        self.available_drivers = []
+        self.batch = batch
+        if idle_drivers is None:
+            idle_drivers = DriverIndex()
+        self.rider_waiting_list = WaitingList()
+        self.available_drivers = {}
+        self._idle_drivers = idle_drivers
 
     def __str__(self):
         """Return a string representation.
@@ -35,26 +71,24 @@ class Dispatcher:
         """
         return "Dispatcher: Available Drivers: {}, Riders waiting: {}".format(len(self.available_drivers),len(self.rider_waiting_list))
 
-    def request_driver(self, rider):
+    def request_driver(self, rider, timestamp=None):
         """Return a driver for the rider, or None if no driver is available.
 
         Add the rider to the waiting list if there is no available driver.
 
         @type self: Dispatcher
         @type rider: Rider
+        @type timestamp: int | None
+            The time of the request, used to report the oldest wait.
         @rtype: Driver | None
         """
-        if not self.available_drivers == []:
-            closest_driver_integer = manhattan_distance(self.available_drivers[0].location,rider.origin)/self.available_drivers[0].speed
-            closest_driver = self.available_drivers[0]
-            for driver in self.available_drivers:
-                if manhattan_distance(driver.location,rider.origin)/driver.speed < closest_driver_integer:
-                    if driver.idle:
-                        closest_driver = driver
-            return closest_driver
+        if self.batch:
+            closest_driver = None
         else:
-            self.rider_waiting_list.append(rider)
-            return None
+            closest_driver = self._idle_drivers.nearest(rider.origin)
+        if closest_driver is None:
+            self.rider_waiting_list.add(rider, timestamp)
+        return closest_driver
 
     def request_rider(self, driver):
         """Return a rider for the driver, or None if no rider is available.
@@ -65,20 +99,146 @@ class Dispatcher:
         @type driver: Driver
         @rtype: Rider | None
         """
-        if driver not in self.available_drivers:
-            self.available_drivers.append(driver)
-            if not self.rider_waiting_list == []:
-                driver.idle = False
-                return self.rider_waiting_list.pop(0)
-            else:
-                driver.idle = True
-                return None
-        else:
-            if not self.rider_waiting_list == []:
+        if driver.identifier not in self.available_drivers:
+            self.available_drivers[driver.identifier] = driver
+            self._idle_drivers.add(driver)
+        if not self.batch and not self.rider_waiting_list.is_empty():
+            driver.idle = False
+            return self.rider_waiting_list.remove()
+        return None
+
+    def match_batch(self):
+        """Match the waiting riders with the idle drivers, and return the
+        matched pairs.
+
+        The matching minimizes the total travel time of the drivers to
+        their riders. If there are more than MAX_OPTIMAL_BATCH riders or
+        idle drivers, each rider is instead given the closest idle driver
+        in turn, oldest request first. Matched riders leave the waiting list
+        and matched drivers are no longer idle.
+
+        @type self: Dispatcher
+        @rtype: list[(Rider, Driver)]
+
+        >>> from location import Location
+        >>> from rider import Rider, WAITING
+        >>> dispatcher = Dispatcher(batch=True)
+        >>> for name, row in [("a", 0), ("b", 3)]:
+        ...     _ = dispatcher.request_rider(Driver(name, Location(row, 0), 1))
+        >>> for name, row in [("x", 2), ("y", 0)]:
+        ...     _ = dispatcher.request_driver(
+        ...         Rider(name, Location(row, 0), Location(9, 9), WAITING, 9))
+        >>> [(str(rider), str(driver)) for rider, driver in
+        ...  dispatcher.match_batch()]
+        [('x', 'b'), ('y', 'a')]
+        """
+        if self.rider_waiting_list.is_empty() or not self._idle_drivers:
+            return []
+        riders = self.rider_waiting_list.riders()
+        if max(len(riders), len(self._idle_drivers)) > MAX_OPTIMAL_BATCH:
+            matches = []
+            for rider in riders:
+                driver = self._idle_drivers.nearest(rider.origin)
+                if driver is None:
+                    break
+                matches.append((rider, driver))
                 driver.idle = False
-                return self.rider_waiting_list.pop(0)
-            else:
-                return None
+                self.rider_waiting_list.discard(rider)
+            return matches
+
+        drivers = self._idle_drivers.idle_drivers()
+        cost = [[distance(driver.location, rider.origin) /
+                 driver.speed for driver in drivers] for rider in riders]
+        matches = []
+        for rider, column in zip(riders, min_cost_assignment(cost)):
+            if column is not None:
+                matches.append((rider, drivers[column]))
+                drivers[column].idle = False
+                self.rider_waiting_list.discard(rider)
+        return matches
+
+    def unregister(self, driver):
+        """Stop using the registered <driver> for rider requests, such as
+        when the driver leaves the area served by this dispatcher. The
+        driver is registered again by its next request for a rider.
+
+        @type self: Dispatcher
+        @type driver: Driver
+        @rtype: None
+
+        >>> from location import Location
+        >>> dispatcher = Dispatcher()
+        >>> driver = Driver("Amaranth", Location(1, 1), 1)
+        >>> dispatcher.request_rider(driver) is None
+        True
+        >>> dispatcher.unregister(driver)
+        >>> dispatcher.is_registered(driver), dispatcher.idle_driver_count()
+        (False, 0)
+        """
+        del self.available_drivers[driver.identifier]
+        self._idle_drivers.remove(driver)
+
+    def is_registered(self, driver):
+        """Return True iff <driver> is registered with this dispatcher.
+
+        @type self: Dispatcher
+        @type driver: Driver
+        @rtype: bool
+        """
+        return driver.identifier in self.available_drivers
+
+    def idle_driver_count(self):
+        """Return the number of registered drivers that are idle.
+
+        @type self: Dispatcher
+        @rtype: int
+
+        >>> from location import Location
+        >>> dispatcher = Dispatcher()
+        >>> driver = Driver("Amaranth", Location(1, 1), 1)
+        >>> dispatcher.request_rider(driver) is None
+        True
+        >>> dispatcher.is_registered(driver), dispatcher.idle_driver_count()
+        (True, 1)
+        >>> driver.idle = False
+        >>> dispatcher.idle_driver_count()
+        0
+        """
+        return len(self._idle_drivers)
+
+    def waiting_rider_count(self):
+        """Return the number of riders on the waiting list.
+
+        @type self: Dispatcher
+        @rtype: int
+        """
+        return len(self.rider_waiting_list)
+
+    def oldest_wait(self, timestamp):
+        """Return how long the rider at the front of the waiting list has
+        been waiting at <timestamp>, or None if no rider is waiting or
+        their request time is unknown.
+
+        @type self: Dispatcher
+        @type timestamp: int
+        @rtype: int | None
+
+        >>> from location import Location
+        >>> from rider import Rider, WAITING
+        >>> dispatcher = Dispatcher()
+        >>> rider = Rider("Almond", Location(1, 1), Location(5, 5), WAITING, 10)
+        >>> dispatcher.request_driver(rider, 3) is None
+        True
+        >>> dispatcher.waiting_rider_count(), dispatcher.oldest_wait(7)
+        (1, 4)
+        >>> dispatcher.cancel_ride(rider)
+        >>> dispatcher.waiting_rider_count(), dispatcher.oldest_wait(7)
+        (0, None)
+        """
+        oldest = self.rider_waiting_list.oldest()
+        if oldest is None or oldest[1] is None:
+            return None
+        return timestamp - oldest[1]
 
     def cancel_ride(self, rider):
         """Cancel the ride for rider.
@@ -87,5 +247,5 @@ class Dispatcher:
         @type rider: Rider
         @rtype: None
         """
-        rider.status = "cancelled"
-        self.rider_waiting_list.remove(rider)
+        rider.status = CANCELLED
+        self.rider_waiting_list.discard(rider)
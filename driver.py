@@ -1,5 +1,6 @@
-from location import Location, manhattan_distance
+from location import Location
 from rider import Rider
+from travel import travel_time
 
 
 class Driver:
@@ -12,8 +13,14 @@ class Driver:
         The current location of the driver.
     @type is_idle: bool
         A property that is True if the driver is idle and False otherwise.
+    @type index: DriverIndex | Fleet | None
+        The index of idle drivers this driver is registered with, which is
+        updated whenever the driver becomes idle or busy.
     """
 
+    __slots__ = ("identifier", "location", "speed", "destination", "index",
+                 "_idle")
+
     def __init__(self, identifier, location, speed):
         """Initialize a Driver.
 
@@ -24,12 +31,12 @@ class Driver:
         @type destination: Location | None
         @rtype: None
         """
-        # TODO
         self.identifier = identifier
         self.location = location
         self.speed = speed
         self.destination = None
-        self.idle = True
+        self.index = None
+        self._idle = True
 
     def __str__(self):
         """Return a string representation.
@@ -47,6 +54,28 @@ class Driver:
         """
         return self.identifier == other.identifier
 
+    @property
+    def idle(self):
+        """Return True if the driver is idle and False otherwise.
+
+        @type self: Driver
+        @rtype: bool
+        """
+        return self._idle
+
+    @idle.setter
+    def idle(self, idle):
+        """Set whether the driver is idle, updating the driver's index.
+
+        @type self: Driver
+        @type idle: bool
+        @rtype: None
+        """
+        if idle != self._idle:
+            self._idle = idle
+            if self.index is not None:
+                self.index.update(self)
+
     def get_travel_time(self,destination):
         """Return the time it will take to arrive at the destination,
         rounded to the nearest integer.
@@ -56,7 +85,7 @@ class Driver:
         @rtype: int
         """
         self.destination = destination
-        return round(manhattan_distance(self.location,destination)/self.speed)
+        return travel_time(self.location, destination, self.speed)
 
     def start_drive(self, location):
         """Start driving to the location and return the time the drive will take.
@@ -79,8 +108,7 @@ class Driver:
         @type self: Driver
         @rtype: None
         """
-        self.location.row = self.destination.row
-        self.location.column = self.destination.column
+        self.location = self.destination
 
     def start_ride(self, rider):
         """Start a ride and return the time the ride will take.
@@ -102,7 +130,6 @@ class Driver:
         @type self: Driver
         @rtype: None
         """
-        self.location.row = self.destination.row
-        self.location.column = self.destination.column
+        self.location = self.destination
         self.idle = True
 
@@ -28,8 +28,14 @@ class Event:
     === Attributes ===
     @type timestamp: int
         A timestamp for this event.
+    @type cancelled: bool
+        True iff this event has been cancelled. A cancelled event would have
+        no effect if it were done, so the simulation discards it instead of
+        calling do().
     """
 
+    __slots__ = ("timestamp", "cancelled")
+
     def __init__(self, timestamp):
         """Initialize an Event with a given timestamp.
 
@@ -43,6 +49,23 @@ class Event:
         7
         """
         self.timestamp = timestamp
+        self.cancelled = False
+
+    def cancel(self):
+        """Mark this event as cancelled.
+
+        Only events whose do() would no longer change the state of the
+        simulation may be cancelled.
+
+        @type self: Event
+        @rtype: None
+
+        >>> event = Event(7)
+        >>> event.cancel()
+        >>> event.cancelled
+        True
+        """
+        self.cancelled = True
 
     # The following six 'magic methods' are overridden to allow for easy
     # comparison of Event instances. All comparisons simply perform the
@@ -190,6 +213,8 @@ class RiderRequest(Event):
         The rider.
     """
 
+    __slots__ = ("rider",)
+
     def __init__(self, timestamp, rider):
         """Initialize a RiderRequest event.
 
@@ -206,7 +231,8 @@ class RiderRequest(Event):
         the rider.
 
         Return a Cancellation event. If the rider is assigned to a driver,
-        also return a Pickup event.
+        also return a Pickup event. The Cancellation event is recorded on
+        the rider so that it can be cancelled once the rider is picked up.
 
         @type self: RiderRequest
         @type dispatcher: Dispatcher
@@ -216,11 +242,13 @@ class RiderRequest(Event):
         monitor.notify(self.timestamp, RIDER, REQUEST,self.rider.identifier, self.rider.origin)
 
         events = []
-        driver = dispatcher.request_driver(self.rider)
+        driver = dispatcher.request_driver(self.rider, self.timestamp)
         if driver is not None:
             travel_time = driver.start_drive(self.rider.origin)
             events.append(Pickup(self.timestamp + travel_time, self.rider, driver))
-        events.append(Cancellation(self.timestamp + self.rider.patience, self.rider))
+        cancellation = Cancellation(self.timestamp + self.rider.patience, self.rider)
+        self.rider.cancellation = cancellation
+        events.append(cancellation)
         return events
 
     def __str__(self):
@@ -239,6 +267,8 @@ class DriverRequest(Event):
         The driver.
     """
 
+    __slots__ = ("driver",)
+
     def __init__(self, timestamp, driver):
         """Initialize a DriverRequest event.
 
@@ -289,6 +319,8 @@ class Cancellation(Event):
     @type rider: Rider
     """
 
+    __slots__ = ("rider",)
+
     def __init__(self,timestamp,rider):
         """
         Initialize a ride cancel request
@@ -313,7 +345,7 @@ class Cancellation(Event):
         """
         if self.timestamp > self.rider.patience:
             if self.rider.status != SATISFIED:
-                self.rider.status = CANCELLED
+                dispatcher.cancel_ride(self.rider)
                 monitor.notify(self.timestamp,RIDER,CANCEL,self.rider.identifier,self.rider.origin)
         return []
 
@@ -337,6 +369,8 @@ class Pickup(Event):
     A driver
     """
 
+    __slots__ = ("rider", "driver")
+
     def __init__ (self,timestamp,rider,driver):
         """
         Initializes a pickup event
@@ -364,9 +398,13 @@ class Pickup(Event):
             if self.timestamp < self.rider.patience:
                 self.driver.idle = False
                 monitor.notify(self.timestamp,DRIVER,PICKUP,self.driver.identifier,self.driver.location)
+                # A rider that is picked up can no longer cancel.
+                monitor.close(RIDER, self.rider.identifier)
                 arrival_time = self.driver.start_ride(self.rider)
                 events.append(Dropoff(self.timestamp+arrival_time,self.rider,self.driver))
                 self.rider.status = SATISFIED
+                if self.rider.cancellation is not None:
+                    self.rider.cancellation.cancel()
 
         elif self.rider.status == CANCELLED:
             self.driver.idle = True
@@ -395,6 +433,7 @@ class Dropoff(Event):
     A driver
     """
 
+    __slots__ = ("rider", "driver")
 
     def __init__(self,timestamp,rider,driver):
         """
@@ -435,6 +474,21 @@ class Dropoff(Event):
         return "{} -- {}: Dropoff {}".format(self.timestamp,self.driver,self.rider)
 
 
+def create_pickups(timestamp, matches):
+    """Start each matched driver driving to their rider at <timestamp>, and
+    return the Pickup events for the matches.
+
+    @type timestamp: int
+    @type matches: list[(Rider, Driver)]
+    @rtype: list[Pickup]
+    """
+    events = []
+    for rider, driver in matches:
+        travel_time = driver.start_drive(rider.origin)
+        events.append(Pickup(timestamp + travel_time, rider, driver))
+    return events
+
+
 def create_event_list(filename):
     """Return a list of Events based on raw list of events in <filename>.
 
@@ -445,7 +499,26 @@ def create_event_list(filename):
         The name of a file that contains the list of events.
     @rtype: list[Event]
     """
-    events = []
+    return list(iter_events(filename))
+
+
+def iter_events(filename):
+    """Yield the Events in <filename> one at a time, in the order they appear
+    in the file.
+
+    Only the line being parsed is held in memory, so this can be used to
+    stream a large file into Simulation.run.
+
+    Precondition: the file stored at <filename> is in the format specified
+    by the assignment handout.
+
+    @param filename: str
+        The name of a file that contains the list of events.
+    @rtype: iterator[Event]
+
+    >>> [event.timestamp for event in iter_events("events.txt")][:8]
+    [0, 0, 0, 0, 0, 0, 0, 5]
+    """
     with open(filename, "r") as file:
         for line in file:
             line = line.strip()
@@ -467,6 +540,4 @@ def create_event_list(filename):
                 patience = int(tokens[5])
                 event = RiderRequest(timestamp,Rider(identifier,location,destination,WAITING,patience))
 
-            events.append(event)
-
-    return events
+            yield event
@@ -0,0 +1,191 @@
+"""
+The fleet module contains the Fleet class, an array-backed store of the
+drivers registered with a dispatcher.
+"""
+import numpy as np
+
+from travel import distance, get_travel_times
+
+
+class Fleet:
+    """An array-backed store of drivers, used by a Dispatcher in place of a
+    DriverIndex to find the closest idle driver to a location.
+
+    Each driver added to the fleet is given a slot, and the row, column,
+    speed and idle status of every driver are kept in NumPy arrays indexed
+    by slot. Drivers added to the fleet write their state into their slot
+    whenever they become idle or busy, so the arrays always hold the
+    location of every idle driver. Finding the closest idle driver is then a
+    single vectorized argmin over the travel times of the whole fleet, or,
+    when the travel time service does not use Manhattan distances, a scan
+    of the drivers in order of their Manhattan travel time, which bounds
+    the real one.
+    """
+
+    # === Private Attributes ===
+    # @type _drivers: list[Driver | None]
+    #     The drivers in the fleet, indexed by slot, or None for the slots
+    #     of removed drivers.
+    # @type _slots: dict[str, int]
+    #     Maps the identifier of each driver to its slot.
+    # @type _rows: numpy.ndarray
+    #     The row of each driver, indexed by slot.
+    # @type _columns: numpy.ndarray
+    #     The column of each driver, indexed by slot.
+    # @type _speeds: numpy.ndarray
+    #     The speed of each driver, indexed by slot.
+    # @type _idle: numpy.ndarray
+    #     Whether each driver is idle, indexed by slot.
+    # @type _size: int
+    #     The number of idle drivers in the fleet.
+    #
+    # === Representation Invariants ===
+    # The arrays all have the same length, which is at least len(_drivers).
+    # Slots past len(_drivers) and slots of removed drivers are not idle.
+
+    def __init__(self, capacity=1024):
+        """Initialize an empty Fleet.
+
+        @type self: Fleet
+        @type capacity: int
+            The number of drivers to allocate space for. The arrays grow
+            as needed.
+        @rtype: None
+        """
+        self._drivers = []
+        self._slots = {}
+        self._rows = np.zeros(capacity, dtype=np.int64)
+        self._columns = np.zeros(capacity, dtype=np.int64)
+        self._speeds = np.ones(capacity, dtype=np.int64)
+        self._idle = np.zeros(capacity, dtype=bool)
+        self._size = 0
+
+    def __len__(self):
+        """Return the number of idle drivers in this Fleet.
+
+        @type self: Fleet
+        @rtype: int
+        """
+        return self._size
+
+    def __contains__(self, driver):
+        """Return True iff <driver> has been added to this Fleet.
+
+        @type self: Fleet
+        @type driver: Driver
+        @rtype: bool
+        """
+        return driver.identifier in self._slots
+
+    def idle_drivers(self):
+        """Return the idle drivers in this Fleet, in the order they were
+        added.
+
+        @type self: Fleet
+        @rtype: list[Driver]
+        """
+        slots = np.flatnonzero(self._idle[:len(self._drivers)])
+        return [self._drivers[slot] for slot in slots.tolist()]
+
+    def add(self, driver):
+        """Add <driver> to this Fleet and track its idle status.
+
+        @type self: Fleet
+        @type driver: Driver
+        @rtype: None
+        """
+        slot = len(self._drivers)
+        if slot == len(self._idle):
+            self._grow()
+        self._slots[driver.identifier] = slot
+        self._drivers.append(driver)
+        self._speeds[slot] = driver.speed
+        driver.index = self
+        self.update(driver)
+
+    def remove(self, driver):
+        """Remove <driver> from this Fleet and stop tracking its idle status.
+
+        Its slot is not reused.
+
+        @type self: Fleet
+        @type driver: Driver
+        @rtype: None
+        """
+        slot = self._slots.pop(driver.identifier)
+        self._size -= int(self._idle[slot])
+        self._idle[slot] = False
+        self._drivers[slot] = None
+        driver.index = None
+
+    def update(self, driver):
+        """Write the location and idle status of <driver> into its slot.
+
+        @type self: Fleet
+        @type driver: Driver
+        @rtype: None
+        """
+        slot = self._slots[driver.identifier]
+        self._size += int(driver.idle) - int(self._idle[slot])
+        self._idle[slot] = driver.idle
+        self._rows[slot] = driver.location.row
+        self._columns[slot] = driver.location.column
+
+    def nearest(self, location):
+        """Return the idle driver with the smallest travel time to
+        <location>, or None if there is no idle driver.
+
+        Ties are broken in favour of the driver added to the fleet first.
+
+        @type self: Fleet
+        @type location: Location
+        @rtype: Driver | None
+
+        >>> from driver import Driver
+        >>> from location import Location
+        >>> fleet = Fleet(2)
+        >>> for name, row, speed in [("a", 0, 1), ("b", 9, 1), ("c", 20, 4)]:
+        ...     fleet.add(Driver(name, Location(row, 0), speed))
+        >>> print(fleet.nearest(Location(8, 0)))
+        b
+        >>> print(fleet.nearest(Location(16, 0)))
+        c
+        """
+        if self._size == 0:
+            return None
+        count = len(self._drivers)
+        times = (np.abs(self._rows[:count] - location.row) +
+                 np.abs(self._columns[:count] - location.column)) / \
+            self._speeds[:count]
+        times[~self._idle[:count]] = np.inf
+        if get_travel_times().manhattan:
+            return self._drivers[int(np.argmin(times))]
+
+        # The Manhattan travel times are lower bounds of the real ones, so
+        # only the drivers whose bound beats the best so far are measured.
+        best = None
+        best_key = None
+        for slot in np.argsort(times, kind="stable").tolist():
+            if times[slot] == np.inf or \
+                    best_key is not None and times[slot] > best_key[0]:
+                break
+            driver = self._drivers[slot]
+            key = (distance(driver.location, location) / driver.speed, slot)
+            if best_key is None or key < best_key:
+                best = driver
+                best_key = key
+        return best
+
+    def _grow(self):
+        """Double the capacity of the arrays.
+
+        @type self: Fleet
+        @rtype: None
+        """
+        capacity = max(2 * len(self._idle), 1)
+        self._rows = np.resize(self._rows, capacity)
+        self._columns = np.resize(self._columns, capacity)
+        self._speeds = np.resize(self._speeds, capacity)
+        idle = np.zeros(capacity, dtype=bool)
+        idle[:len(self._idle)] = self._idle
+        self._idle = idle
@@ -1,14 +1,61 @@
 class Location:
-    def __init__(self, row, column):
-        """Initialize a location.
+    """A location on the grid.
 
-        @type self: Location
+    Locations are immutable and interned: creating a Location with the same
+    row and column as an existing one usually returns the existing object,
+    so every driver, rider and activity at the same place shares one
+    Location. The intern table holds at most MAX_INTERNED locations, and is
+    emptied when it is full, so two equal Locations are not always the same
+    object.
+
+    === Attributes ===
+    @type row: int
+        The row of the location.
+    @type column: int
+        The column of the location.
+    """
+
+    __slots__ = ("row", "column")
+
+    def __new__(cls, row, column):
+        """Return the location at <row>, <column>.
+
+        @type cls: type
         @type row: int
         @type column: int
+        @rtype: Location
+
+        >>> Location(1, 2) is Location(1, 2)
+        True
+        """
+        location = _interned.get((row, column))
+        if location is None:
+            if len(_interned) >= MAX_INTERNED:
+                _interned.clear()
+            location = object.__new__(cls)
+            object.__setattr__(location, "row", row)
+            object.__setattr__(location, "column", column)
+            _interned[(row, column)] = location
+        return location
+
+    def __setattr__(self, name, value):
+        """Raise AttributeError, since Locations are immutable.
+
+        @type self: Location
+        @type name: str
+        @type value: object
         @rtype: None
         """
-        self.row = row
-        self.column = column
+        raise AttributeError("Location is immutable")
+
+    def __reduce__(self):
+        """Return the arguments used to pickle this location, so that it is
+        interned again when unpickled.
+
+        @type self: Location
+        @rtype: (type, (int, int))
+        """
+        return Location, (self.row, self.column)
 
     def __str__(self):
         """Return a string representation.
@@ -21,8 +68,30 @@ class Location:
         """Return True if self equals other, and false otherwise.
 
         @rtype: bool
+
+        >>> Location(1, 2) == Location(1, 2)
+        True
+        >>> Location(1, 2) == Location(2, 1)
+        False
+        >>> Location(1, 2) == (1, 2)
+        False
         """
-        return self == other
+        if not isinstance(other, Location):
+            return NotImplemented
+        return self.row == other.row and self.column == other.column
+
+    def __hash__(self):
+        """Return a hash of this location.
+
+        @rtype: int
+        """
+        return hash((self.row, self.column))
+
+
+# The largest number of interned Locations, and a map from (row, column) to
+# the interned Location at that row and column.
+MAX_INTERNED = 1 << 18
+_interned = {}
 
 
 def manhattan_distance(origin, destination):
@@ -41,6 +110,10 @@ def deserialize_location(location_str):
     @type location_str: str
         A location in the format 'row,col'
     @rtype: Location
+
+    >>> print(deserialize_location("120,7"))
+    120,7
     """
-    return Location(int(location_str[0]),int(location_str[2]))
+    row, column = location_str.split(",")
+    return Location(int(row),int(column))
 
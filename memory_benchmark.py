@@ -0,0 +1,133 @@
+"""
+The memory_benchmark module measures how many bytes each rider and each
+event takes up in memory.
+
+The slotted Rider, Location and Event classes are compared with
+dict-backed classes holding the same attributes, which is how those classes
+were stored before they used __slots__ and interned Locations.
+
+Run it as a script:
+
+    python memory_benchmark.py [number of riders] [grid size]
+"""
+import random
+import sys
+import tracemalloc
+
+from event import RiderRequest
+from location import Location
+from rider import Rider, WAITING
+
+
+class _DictLocation:
+    """A dict-backed location, as Location was stored before."""
+
+    def __init__(self, row, column):
+        """Initialize a _DictLocation.
+
+        @type self: _DictLocation
+        @type row: int
+        @type column: int
+        @rtype: None
+        """
+        self.row = row
+        self.column = column
+
+
+class _DictRider:
+    """A dict-backed rider, as Rider was stored before."""
+
+    def __init__(self, identifier, origin, destination, status, patience):
+        """Initialize a _DictRider.
+
+        @type self: _DictRider
+        @type identifier: str
+        @type origin: _DictLocation
+        @type destination: _DictLocation
+        @type status: str
+        @type patience: int
+        @rtype: None
+        """
+        self.status = status
+        self.identifier = identifier
+        self.origin = origin
+        self.destination = destination
+        self.patience = patience
+        self.cancellation = None
+
+
+class _DictRiderRequest:
+    """A dict-backed rider request, as RiderRequest was stored before."""
+
+    def __init__(self, timestamp, rider):
+        """Initialize a _DictRiderRequest.
+
+        @type self: _DictRiderRequest
+        @type timestamp: int
+        @type rider: _DictRider
+        @rtype: None
+        """
+        self.timestamp = timestamp
+        self.cancelled = False
+        self.rider = rider
+
+
+def measure(make, count):
+    """Return the average number of bytes allocated by each of <count>
+    calls to <make>, keeping every result alive.
+
+    @type make: (int) -> object
+    @type count: int
+        Precondition: count > 0
+    @rtype: float
+    """
+    tracemalloc.start()
+    objects = [None] * count
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(count):
+        objects[i] = make(i)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / count
+
+
+def run(count=100000, grid_size=100, seed=0):
+    """Return a dict of the bytes per rider and bytes per event, before and
+    after, for <count> riders on a <grid_size> by <grid_size> grid.
+
+    @type count: int
+    @type grid_size: int
+    @type seed: int
+    @rtype: dict[str, float]
+    """
+    generator = random.Random(seed)
+    coordinates = [tuple(generator.randrange(grid_size) for _ in range(4))
+                   for _ in range(count)]
+    identifiers = ["Rider{}".format(i) for i in range(count)]
+
+    def dict_rider(i):
+        row, column, destination_row, destination_column = coordinates[i]
+        return _DictRider(identifiers[i], _DictLocation(row, column),
+                          _DictLocation(destination_row, destination_column),
+                          WAITING, 10)
+
+    def slotted_rider(i):
+        row, column, destination_row, destination_column = coordinates[i]
+        return Rider(identifiers[i], Location(row, column),
+                     Location(destination_row, destination_column),
+                     WAITING, 10)
+
+    rider = dict_rider(0)
+    dict_event = measure(lambda i: _DictRiderRequest(i, rider), count)
+    rider = slotted_rider(0)
+    slotted_event = measure(lambda i: RiderRequest(i, rider), count)
+    return {"bytes_per_rider_before": measure(dict_rider, count),
+            "bytes_per_rider_after": measure(slotted_rider, count),
+            "bytes_per_event_before": dict_event,
+            "bytes_per_event_after": slotted_event}
+
+
+if __name__ == "__main__":
+    arguments = [int(argument) for argument in sys.argv[1:3]]
+    for name, value in run(*arguments).items():
+        print("{:<24}{:>10.1f}".format(name, value))
@@ -1,4 +1,5 @@
-from location import manhattan_distance
+from sketch import Histogram, QuantileSketch
+from travel import distance as travel_distance
 """
 The Monitor module contains the Monitor class, the Activity class,
 and a collection of constants. Together the elements of the module
@@ -45,6 +46,8 @@ class Activity:
         The location at which the activity occurred.
     """
 
+    __slots__ = ("description", "time", "id", "location")
+
     def __init__(self, timestamp, description, identifier, location):
         """Initialize an Activity.
 
@@ -110,6 +113,18 @@ class Monitor:
         activity = Activity(timestamp, description, identifier, location)
         self._activities[category][identifier].append(activity)
 
+    def close(self, category, identifier):
+        """Notify the monitor that the actor <identifier> of <category> will
+        take part in no more activities.
+
+        A Monitor keeps every activity, so this does nothing.
+
+        @type self: Monitor
+        @type category: DRIVER | RIDER
+        @type identifier: str
+        @rtype: None
+        """
+
     def report(self):
         """Return a report of the activities that have occurred.
 
@@ -145,11 +160,11 @@ class Monitor:
         count = 0
         for activities in self._activities[DRIVER].values():
             if len(activities) == 2:
-                distance += manhattan_distance(activities[0].location,activities[1].location)
+                distance += travel_distance(activities[0].location,activities[1].location)
                 count += 1
             elif len(activities) == 3:
-                distance += manhattan_distance(activities[0].location,activities[1].location) \
-                    + manhattan_distance(activities[1].location,activities[2].location)
+                distance += travel_distance(activities[0].location,activities[1].location) \
+                    + travel_distance(activities[1].location,activities[2].location)
                 count += 1
         return distance/count
 
@@ -164,8 +179,268 @@ class Monitor:
         for activities in self._activities[DRIVER].values():
             for value in range(len(activities)):
                 if activities[value].description == PICKUP:
-                    distance += manhattan_distance(activities[value].location,activities[value+1].location)
+                    distance += travel_distance(activities[value].location,activities[value+1].location)
                     count += 1
         return distance/count
 
 
+# The distributions summarized by a StreamingMonitor, the percentiles of
+# them in its report, and the default edges of their histogram buckets.
+DISTRIBUTIONS = ["rider_wait_time", "driver_pickup_distance",
+                 "driver_ride_distance"]
+PERCENTILES = [50, 95, 99]
+HISTOGRAM_EDGES = [0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+
+class StreamingMonitor(Monitor):
+    """A monitor that keeps running totals of the statistics in its report
+    instead of a record of every activity.
+
+    Only the open state of each actor is kept: the time of a rider's first
+    activity until their second one arrives or they are closed, and each
+    driver's activity count, last location and distance so far. A rider's
+    state is deleted once it closes. report() returns the same dictionary
+    as a Monitor notified of the same activities, in constant time.
+
+    Rider wait times, driver pickup distances and ride distances are also
+    fed into a QuantileSketch and a Histogram each, and report() includes
+    their 50th, 95th and 99th percentiles and histogram counts under extra
+    keys such as "rider_wait_time_p95" and "rider_wait_time_histogram".
+    The statistics of monitors from separate runs can be combined with
+    merge().
+    """
+
+    # === Private Attributes ===
+    # @type _riders: dict[str, int]
+    #     Maps the identifier of each rider whose second activity has not
+    #     arrived to the time of its first activity.
+    # @type _drivers: dict[str, list]
+    #     Maps each driver identifier to [number of activities (at most 4),
+    #     location of the last activity, distance between its first
+    #     activities, whether the last activity was a pickup, state of the
+    #     rider activities under the driver's identifier]. Dropoffs are
+    #     rider activities under the identifier of the driver, and only the
+    #     first two of them count, so their state is the time of the first
+    #     one, True once the second one has been counted, or None.
+    # @type _wait_time: int
+    # @type _wait_count: int
+    #     The total and number of rider wait times.
+    # @type _total_distance: int
+    # @type _total_count: int
+    #     The total and number of driver total distances.
+    # @type _ride_distance: int
+    # @type _ride_count: int
+    #     The total and number of ride distances.
+    # @type _sketches: dict[str, QuantileSketch]
+    # @type _histograms: dict[str, Histogram]
+    #     The sketch and histogram of each distribution in the report.
+
+    def __init__(self, histogram_edges=HISTOGRAM_EDGES):
+        """Initialize a StreamingMonitor.
+
+        @type self: StreamingMonitor
+        @type histogram_edges: list[int]
+            The bucket edges of the histograms.
+        """
+        self._sketches = {name: QuantileSketch() for name in DISTRIBUTIONS}
+        self._histograms = {name: Histogram(histogram_edges)
+                            for name in DISTRIBUTIONS}
+        self._riders = {}
+        self._drivers = {}
+        self._wait_time = 0
+        self._wait_count = 0
+        self._total_distance = 0
+        self._total_count = 0
+        self._ride_distance = 0
+        self._ride_count = 0
+
+    def __str__(self):
+        """Return a string representation.
+
+        @type self: StreamingMonitor
+        @rtype: str
+        """
+        return "Monitor ({} drivers, {} riders)".format(len(self._drivers), len(self._riders))
+
+    def notify(self, timestamp, category, description, identifier, location):
+        """Notify the monitor of the activity, and update the running totals.
+
+        @type self: StreamingMonitor
+        @type timestamp: int
+            The time of the activity.
+        @type category: DRIVER | RIDER
+            The category for the activity.
+        @type description: REQUEST | CANCEL | PICKUP | DROP_OFF
+            A description of the activity.
+        @type identifier: str
+            The identifier for the actor.
+        @type location: Location
+            The location of the activity.
+        @rtype: None
+
+        >>> from location import Location
+        >>> monitor = StreamingMonitor()
+        >>> monitor.notify(0, DRIVER, REQUEST, "Amaranth", Location(1, 1))
+        >>> monitor.notify(0, RIDER, REQUEST, "Almond", Location(1, 1))
+        >>> monitor.notify(0, DRIVER, PICKUP, "Amaranth", Location(1, 1))
+        >>> monitor.notify(8, DRIVER, REQUEST, "Amaranth", Location(5, 5))
+        >>> monitor.notify(10, RIDER, CANCEL, "Almond", Location(1, 1))
+        >>> report = monitor.report()
+        >>> [report[key] for key in ["rider_wait_time", "driver_total_distance",
+        ...                          "driver_ride_distance"]]
+        [10.0, 8.0, 8.0]
+        >>> report["driver_ride_distance_p50"]
+        8
+        >>> str(monitor)
+        'Monitor (1 drivers, 0 riders)'
+        """
+        if category == RIDER:
+            start = self._riders.pop(identifier, None)
+            if start is not None:
+                self._add_wait_time(timestamp - start)
+                return
+            state = self._drivers.get(identifier)
+            if state is None:
+                self._riders[identifier] = timestamp
+            elif state[4] is None:
+                state[4] = timestamp
+            elif state[4] is not True:
+                self._add_wait_time(timestamp - state[4])
+                state[4] = True
+            return
+
+        state = self._drivers.get(identifier)
+        if state is None:
+            self._drivers[identifier] = [1, location, 0, description == PICKUP,
+                                         None]
+            return
+        count, last_location, distance, picked_up, _ = state
+        step = travel_distance(last_location, location)
+        if picked_up:
+            self._ride_distance += step
+            self._ride_count += 1
+            self._add_value("driver_ride_distance", step)
+        if description == PICKUP:
+            self._add_value("driver_pickup_distance", step)
+        # A driver's total distance only counts while they have exactly two
+        # or three activities.
+        if count == 1:
+            distance = step
+            self._total_distance += distance
+            self._total_count += 1
+        elif count == 2:
+            distance += step
+            self._total_distance += step
+        elif count == 3:
+            self._total_distance -= distance
+            self._total_count -= 1
+        state[0] = min(count + 1, 4)
+        state[1] = location
+        state[2] = distance
+        state[3] = description == PICKUP
+
+    def close(self, category, identifier):
+        """Notify the monitor that the actor <identifier> of <category> will
+        take part in no more activities, and delete its open state if it is
+        a rider.
+
+        A driver's state is kept, since the rider activities under its
+        identifier are dropoffs, which still count while it drives.
+
+        @type self: StreamingMonitor
+        @type category: DRIVER | RIDER
+        @type identifier: str
+        @rtype: None
+
+        >>> from location import Location
+        >>> monitor = StreamingMonitor()
+        >>> monitor.notify(0, RIDER, REQUEST, "Almond", Location(1, 1))
+        >>> monitor.close(RIDER, "Almond")
+        >>> str(monitor)
+        'Monitor (0 drivers, 0 riders)'
+        """
+        if category == RIDER:
+            self._riders.pop(identifier, None)
+
+    def report(self):
+        """Return a report of the activities that have occurred, including
+        the percentiles and histograms of each distribution.
+
+        @type self: StreamingMonitor
+        @rtype: dict[str, object]
+        """
+        report = super().report()
+        for name in DISTRIBUTIONS:
+            for percentile in PERCENTILES:
+                report["{}_p{}".format(name, percentile)] = \
+                    self._sketches[name].quantile(percentile / 100)
+            report[name + "_histogram"] = self._histograms[name].counts()
+        return report
+
+    def merge(self, other):
+        """Add the statistics of <other>, a StreamingMonitor for a separate
+        run, to this StreamingMonitor's statistics.
+
+        Precondition: <other> has the same histogram edges.
+
+        @type self: StreamingMonitor
+        @type other: StreamingMonitor
+        @rtype: None
+        """
+        self._wait_time += other._wait_time
+        self._wait_count += other._wait_count
+        self._total_distance += other._total_distance
+        self._total_count += other._total_count
+        self._ride_distance += other._ride_distance
+        self._ride_count += other._ride_count
+        for name in DISTRIBUTIONS:
+            self._sketches[name].merge(other._sketches[name])
+            self._histograms[name].merge(other._histograms[name])
+
+    def _add_wait_time(self, wait_time):
+        """Count the wait time <wait_time> of a rider.
+
+        @type self: StreamingMonitor
+        @type wait_time: int
+        @rtype: None
+        """
+        self._wait_time += wait_time
+        self._wait_count += 1
+        self._add_value("rider_wait_time", wait_time)
+
+    def _add_value(self, name, value):
+        """Add <value> to the sketch and histogram of the distribution
+        <name>.
+
+        @type self: StreamingMonitor
+        @type name: str
+        @type value: int
+        @rtype: None
+        """
+        self._sketches[name].add(value)
+        self._histograms[name].add(value)
+
+    def _average_wait_time(self):
+        """Return the average wait time of riders that have either been picked
+        up or have cancelled their ride.
+
+        @type self: StreamingMonitor
+        @rtype: float
+        """
+        return self._wait_time / self._wait_count
+
+    def _average_total_distance(self):
+        """Return the average distance drivers have driven.
+
+        @type self: StreamingMonitor
+        @rtype: float
+        """
+        return self._total_distance / self._total_count
+
+    def _average_ride_distance(self):
+        """Return the average distance drivers have driven on rides.
+
+        @type self: StreamingMonitor
+        @rtype: float
+        """
+        return self._ride_distance / self._ride_count
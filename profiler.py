@@ -0,0 +1,257 @@
+"""
+The profiler module contains the Profiler class, which records where the
+time of a simulation run goes.
+
+A Simulation given a Profiler times every event it does, samples the depth
+of its event queue, counts the cancelled events it skips or compacts away,
+and times the dispatcher's lookups. A Simulation without one only pays for a
+check of its profiler attribute per event.
+"""
+import sys
+import time
+
+from sketch import Histogram, QuantileSketch
+
+# The edges of the latency histograms, in microseconds, and the dispatcher
+# methods that are timed.
+LATENCY_EDGES = [0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 10000]
+DISPATCHER_METHODS = ["request_driver", "request_rider", "match_batch",
+                      "cancel_ride"]
+
+
+class Profiler:
+    """A record of the cost of a simulation run.
+
+    === Attributes ===
+    @type depth_interval: int
+        The simulated time between samples of the event queue depth.
+    @type depths: list[(int, int)]
+        The timestamp and event queue depth of each sample.
+    @type dead: dict[str, int]
+        Maps each event class to the number of its cancelled events that
+        were skipped by the event loop.
+    @type compacted: int
+        The number of cancelled events removed by compacting the queue.
+    """
+
+    # === Private Attributes ===
+    # @type _output: file | None
+    #     Where the summary is written at the end of a run.
+    # @type _timings: dict[str, _Timing]
+    #     Maps the name of each event class and each timed dispatcher
+    #     method to its timing.
+    # @type _next_sample: int | None
+    #     The timestamp from which the queue depth is next sampled.
+
+    def __init__(self, depth_interval=1, output=None):
+        """Initialize a Profiler.
+
+        @type self: Profiler
+        @type depth_interval: int
+        @type output: file | None
+            Where to write the summary at the end of each run, such as
+            sys.stdout, or None to not write it.
+        @rtype: None
+        """
+        self.depth_interval = depth_interval
+        self.depths = []
+        self.dead = {}
+        self.compacted = 0
+        self._output = output
+        self._timings = {}
+        self._next_sample = None
+
+    def instrument(self, dispatcher):
+        """Time the lookups of <dispatcher> from now on.
+
+        @type self: Profiler
+        @type dispatcher: Dispatcher
+        @rtype: None
+        """
+        for name in DISPATCHER_METHODS:
+            setattr(dispatcher, name,
+                    self._timed("Dispatcher." + name,
+                                getattr(dispatcher, name)))
+
+    def do(self, event, dispatcher, monitor):
+        """Do <event> with <dispatcher> and <monitor>, timing it, and return
+        the events it spawns.
+
+        @type self: Profiler
+        @type event: Event
+        @type dispatcher: Dispatcher
+        @type monitor: Monitor
+        @rtype: list[Event]
+        """
+        start = time.perf_counter()
+        outcome = event.do(dispatcher, monitor)
+        self._timing(type(event).__name__).add(time.perf_counter() - start)
+        return outcome
+
+    def record_depth(self, timestamp, depth):
+        """Record that the event queue holds <depth> events at <timestamp>,
+        if a sample is due.
+
+        @type self: Profiler
+        @type timestamp: int
+        @type depth: int
+        @rtype: None
+        """
+        if self._next_sample is None or timestamp >= self._next_sample:
+            self.depths.append((timestamp, depth))
+            self._next_sample = timestamp + self.depth_interval
+
+    def record_dead(self, event):
+        """Record that the cancelled <event> was skipped.
+
+        @type self: Profiler
+        @type event: Event
+        @rtype: None
+        """
+        name = type(event).__name__
+        self.dead[name] = self.dead.get(name, 0) + 1
+
+    def record_compaction(self, removed):
+        """Record that compacting the event queue removed <removed> events.
+
+        @type self: Profiler
+        @type removed: int
+        @rtype: None
+        """
+        self.compacted += removed
+
+    def end_run(self):
+        """Write the summary to the output, if there is one.
+
+        @type self: Profiler
+        @rtype: None
+        """
+        if self._output is not None:
+            self.dump(self._output)
+
+    def summary(self):
+        """Return a summary of the calls timed, the queue depth and the dead
+        events.
+
+        Each event class or dispatcher method that was called is summarized
+        by its number of calls, total seconds, and mean, median and 99th
+        percentile latency in microseconds, and a histogram of its latency
+        in microseconds.
+
+        @type self: Profiler
+        @rtype: dict[str, object]
+
+        >>> from simulation import Simulation
+        >>> from event import create_event_list
+        >>> profiler = Profiler()
+        >>> _ = Simulation(profiler=profiler).run(
+        ...     create_event_list("events.txt"))
+        >>> summary = profiler.summary()
+        >>> summary["calls"]["RiderRequest"]["count"]
+        6
+        >>> summary["calls"]["Dispatcher.request_driver"]["count"]
+        6
+        >>> summary["max_depth"]
+        7
+        """
+        calls = {}
+        for name in sorted(self._timings):
+            timing = self._timings[name]
+            if timing.sketch.count == 0:
+                continue
+            calls[name] = {
+                "count": timing.sketch.count,
+                "seconds": timing.seconds,
+                "mean_us": 1e6 * timing.seconds / timing.sketch.count,
+                "p50_us": timing.sketch.quantile(0.5),
+                "p99_us": timing.sketch.quantile(0.99),
+                "histogram_us": timing.histogram.counts()}
+        return {"calls": calls,
+                "max_depth": max([depth for _, depth in self.depths],
+                                 default=0),
+                "dead": dict(self.dead),
+                "compacted": self.compacted}
+
+    def dump(self, file=sys.stdout):
+        """Write a table of the summary to <file>.
+
+        @type self: Profiler
+        @type file: file
+        @rtype: None
+        """
+        summary = self.summary()
+        print("{:<28}{:>10}{:>12}{:>10}{:>10}{:>10}".format(
+            "call", "count", "seconds", "mean us", "p50 us", "p99 us"),
+            file=file)
+        for name, call in summary["calls"].items():
+            print("{:<28}{:>10}{:>12.4f}{:>10.2f}{:>10.2f}{:>10.2f}".format(
+                name, call["count"], call["seconds"], call["mean_us"],
+                call["p50_us"], call["p99_us"]), file=file)
+        print("max queue depth: {}".format(summary["max_depth"]), file=file)
+        print("dead events skipped: {}, compacted: {}".format(
+            summary["dead"], summary["compacted"]), file=file)
+
+    def _timing(self, name):
+        """Return the timing of <name>, creating it if needed.
+
+        @type self: Profiler
+        @type name: str
+        @rtype: _Timing
+        """
+        timing = self._timings.get(name)
+        if timing is None:
+            timing = self._timings[name] = _Timing()
+        return timing
+
+    def _timed(self, name, method):
+        """Return a function that calls <method> and adds the time it takes
+        to the timing of <name>.
+
+        @type self: Profiler
+        @type name: str
+        @type method: callable
+        @rtype: callable
+        """
+        timing = self._timing(name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                timing.add(time.perf_counter() - start)
+        return timed
+
+
+class _Timing:
+    """The latencies of the calls of one kind.
+
+    === Attributes ===
+    @type seconds: float
+        The total time of the calls.
+    @type sketch: QuantileSketch
+        The latencies of the calls, in microseconds.
+    @type histogram: Histogram
+        The latencies of the calls, in microseconds.
+    """
+
+    def __init__(self):
+        """Initialize a _Timing with no calls.
+
+        @type self: _Timing
+        @rtype: None
+        """
+        self.seconds = 0.0
+        self.sketch = QuantileSketch()
+        self.histogram = Histogram(LATENCY_EDGES)
+
+    def add(self, seconds):
+        """Add a call that took <seconds>.
+
+        @type self: _Timing
+        @type seconds: float
+        @rtype: None
+        """
+        self.seconds += seconds
+        self.sketch.add(1e6 * seconds)
+        self.histogram.add(1e6 * seconds)
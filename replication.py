@@ -0,0 +1,175 @@
+"""
+The replication module runs independent replications of the simulation in
+parallel and aggregates their reports.
+
+Each replication is a (filename, drivers) pair: the text or binary event
+file to simulate, and the number of drivers to keep from it, or None for all
+of them. Only these pairs, and the travel time service in use, are sent
+to the worker processes, which load their own events, and only the report
+dicts are sent back.
+
+Run it as a script:
+
+    python replication.py [--drivers N ...] [--workers N] [--confidence C]
+                          <event file> ...
+"""
+import argparse
+import math
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+from numbers import Real
+
+from binary_events import is_binary_event_file, iter_binary_events
+from event import DriverRequest, iter_events
+from simulation import Simulation
+from travel import get_travel_times, set_travel_times
+
+
+def run_replication(filename, drivers=None):
+    """Run a simulation on the events in <filename> and return its report,
+    or None if a statistic of the report is undefined because nothing was
+    measured for it.
+
+    If <drivers> is not None, only the first <drivers> driver requests in
+    the file are kept, so one file can be replicated with several fleet
+    sizes.
+
+    @type filename: str
+    @type drivers: int | None
+    @rtype: dict[str, object] | None
+
+    >>> run_replication("events.txt")
+    {'rider_wait_time': 5.5, 'driver_total_distance': 6.0, 'driver_ride_distance': 7.0}
+    >>> run_replication("events.txt", 0) is None
+    True
+    """
+    events = read_events(filename)
+    if drivers is not None:
+        events = _limit_drivers(events, drivers)
+    try:
+        return Simulation().run(list(events))
+    except ZeroDivisionError:
+        return None
+
+
+def read_events(filename):
+    """Return an iterator over the Events in <filename>, a text or binary
+    event file.
+
+    @type filename: str
+    @rtype: iterator[Event]
+    """
+    if is_binary_event_file(filename):
+        return iter_binary_events(filename)
+    return iter_events(filename)
+
+
+def _limit_drivers(events, drivers):
+    """Yield the events in <events>, leaving out every driver request after
+    the first <drivers> of them.
+
+    @type events: iterable[Event]
+    @type drivers: int
+    @rtype: iterator[Event]
+    """
+    for event in events:
+        if isinstance(event, DriverRequest):
+            if drivers <= 0:
+                continue
+            drivers -= 1
+        yield event
+
+
+def run_replications(replications, workers=None):
+    """Run every replication in <replications> in a pool of <workers>
+    processes, and return their reports in the same order, with None for
+    the replications whose report is undefined.
+
+    @type replications: list[(str, int | None)]
+    @type workers: int | None
+        The number of worker processes, or None for one per CPU.
+    @rtype: list[dict[str, object] | None]
+    """
+    filenames = [filename for filename, _ in replications]
+    drivers = [limit for _, limit in replications]
+    with ProcessPoolExecutor(workers, initializer=set_travel_times,
+                             initargs=(get_travel_times(),)) as executor:
+        return list(executor.map(run_replication, filenames, drivers))
+
+
+def aggregate(reports, confidence=0.95):
+    """Return the mean, standard deviation and a confidence interval of the
+    mean of each numeric statistic in <reports>, leaving out the reports
+    that are None.
+
+    The interval uses the normal approximation to the distribution of the
+    mean, which suits the tens or hundreds of replications this module is
+    meant for. With a single report, the standard deviation is 0. With no
+    reports, the summary is empty.
+
+    @type reports: list[dict[str, object] | None]
+    @type confidence: float
+        Precondition: 0 < confidence < 1
+    @rtype: dict[str, dict[str, float]]
+
+    >>> summary = aggregate([{"wait": 4.0}, None, {"wait": 6.0}])
+    >>> summary["wait"]["count"], summary["wait"]["mean"]
+    (2, 5.0)
+    >>> summary["wait"]["stdev"]
+    1.4142135623730951
+    >>> round(summary["wait"]["low"], 2), round(summary["wait"]["high"], 2)
+    (3.04, 6.96)
+    >>> aggregate([None])
+    {}
+    """
+    reports = [report for report in reports if report is not None]
+    if not reports:
+        return {}
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    summary = {}
+    for key, value in reports[0].items():
+        if not isinstance(value, Real):
+            continue
+        values = [report[key] for report in reports
+                  if isinstance(report.get(key), Real)]
+        mean = statistics.fmean(values)
+        stdev = statistics.stdev(values) if len(values) > 1 else 0.0
+        half_width = z * stdev / math.sqrt(len(values))
+        summary[key] = {"count": len(values), "mean": mean, "stdev": stdev,
+                        "low": mean - half_width, "high": mean + half_width}
+    return summary
+
+
+def _main():
+    """Run the replications given on the command line and print the
+    aggregate statistics of each fleet size.
+
+    @rtype: None
+    """
+    parser = argparse.ArgumentParser(
+        description="Run simulation replications in parallel.")
+    parser.add_argument("files", nargs="+", help="text or binary event files")
+    parser.add_argument("--drivers", type=int, nargs="+", default=[None],
+                        help="fleet sizes to replicate each file with")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes")
+    parser.add_argument("--confidence", type=float, default=0.95,
+                        help="confidence level of the intervals")
+    arguments = parser.parse_args()
+
+    replications = [(filename, drivers) for drivers in arguments.drivers
+                    for filename in arguments.files]
+    reports = run_replications(replications, arguments.workers)
+    for drivers in arguments.drivers:
+        group = [report for (_, limit), report in zip(replications, reports)
+                 if limit == drivers]
+        print("drivers: {}, replications: {}, undefined: {}".format(
+            "all" if drivers is None else drivers, len(group),
+            group.count(None)))
+        for key, stats in aggregate(group, arguments.confidence).items():
+            print("  {:<24}{:>10.3f}  [{:.3f}, {:.3f}]".format(
+                key, stats["mean"], stats["low"], stats["high"]))
+
+
+if __name__ == "__main__":
+    _main()
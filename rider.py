@@ -20,6 +20,10 @@ class Rider:
     """
     Initialize a new rider
     """
+
+    __slots__ = ("status", "identifier", "origin", "destination", "patience",
+                 "cancellation")
+
     def __init__(self,identifier,origin,destination,status,patience):
         '''
         :param identifier: A riders identifier
@@ -27,12 +31,16 @@ class Rider:
         :param destination: Location
         :param patience: Integer, the riders patience
         :return: None
+
+        The rider's pending Cancellation event, if any, is kept in
+        cancellation so it can be cancelled once the rider is satisfied.
         '''
         self.status = status
         self.identifier = identifier
         self.origin = origin
         self.destination = destination
         self.patience = patience
+        self.cancellation = None
 
 
     def __str__(self):
@@ -0,0 +1,453 @@
+"""
+The roads module contains the RoadNetwork class, a travel time service that
+measures distances along the streets of a road graph instead of as the crow
+drives on an open grid.
+
+The road graph is read from a text file. Its first line gives the size of
+the grid, and every following line closes a street or makes it one-way:
+
+    size <rows> <columns>
+    closed <row> <column> <row> <column>
+    oneway <row> <column> <row> <column>
+
+Every location of the grid is an intersection, joined to its four
+neighbours by streets of length 1 in both directions. "closed" removes the
+street between two neighbouring intersections, and "oneway" only allows
+driving on it from the first to the second. Lines starting with # are
+comments. Every intersection must still be reachable from every other.
+
+Shortest distances are found by A* search, guided by landmarks (ALT): the
+distances to and from a few intersections far apart are computed once, by a
+breadth-first search from each, and give a lower bound on the distance
+between any two intersections. The landmark distances are cached on disk,
+as NumPy .npz files of plain integer arrays named by a hash of the road
+graph file, so only the first use of a graph pays for them, and the
+distances found are kept in an LRU cache. Cache files are read without
+unpickling anything, and a file that does not hold the arrays expected is
+ignored and replaced. The cache directory is given by the cache_directory
+argument, or else by the ROADS_CACHE environment variable, or else is
+.roads_cache in the current directory.
+
+A road distance is never shorter than the Manhattan distance, so the
+DriverIndex and the Fleet still find the closest idle driver with it.
+
+To use the road graph roads.txt for every distance and travel time:
+
+    set_travel_times(RoadNetwork("roads.txt"))
+"""
+import argparse
+import hashlib
+import heapq
+import os
+import sys
+from array import array
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from travel import TravelTimes, CACHE_SIZE
+
+# The default number of landmarks, the number of them used to bound the
+# distances of each search, and the default cache directory.
+LANDMARKS = 8
+ACTIVE_LANDMARKS = 2
+CACHE_DIRECTORY = os.environ.get("ROADS_CACHE", ".roads_cache")
+_CACHE_VERSION = 2
+
+
+def read_road_graph(filename):
+    """Return the number of rows and columns of the road graph file
+    <filename>, and the streets it removes as (from, to) pairs of
+    intersections, each numbered row * columns + column.
+
+    Raise ValueError if the file is not a valid road graph.
+
+    @type filename: str
+    @rtype: (int, int, set[(int, int)])
+
+    >>> rows, columns, removed = read_road_graph("roads.txt")
+    >>> rows, columns, (12, 13) in removed, (13, 12) in removed
+    (10, 10, True, True)
+    """
+    rows = columns = None
+    removed = set()
+    with open(filename) as file:
+        for number, line in enumerate(file, 1):
+            tokens = line.split()
+            if not tokens or tokens[0].startswith("#"):
+                continue
+            if rows is None:
+                if tokens[0] != "size" or len(tokens) != 3:
+                    raise ValueError("{}:{}: expected the grid size".format(
+                        filename, number))
+                rows, columns = int(tokens[1]), int(tokens[2])
+                continue
+            if tokens[0] not in ("closed", "oneway") or len(tokens) != 5:
+                raise ValueError("{}:{}: invalid line: {}".format(
+                    filename, number, line.strip()))
+            row1, column1, row2, column2 = map(int, tokens[1:])
+            if abs(row1 - row2) + abs(column1 - column2) != 1 or not (
+                    0 <= min(row1, row2) and max(row1, row2) < rows and
+                    0 <= min(column1, column2) and
+                    max(column1, column2) < columns):
+                raise ValueError("{}:{}: not a street of the grid: {}".format(
+                    filename, number, line.strip()))
+            first = row1 * columns + column1
+            second = row2 * columns + column2
+            removed.add((second, first))
+            if tokens[0] == "closed":
+                removed.add((first, second))
+    if rows is None:
+        raise ValueError("{}: expected the grid size".format(filename))
+    return rows, columns, removed
+
+
+class RoadNetwork(TravelTimes):
+    """The distances and travel times between locations along the streets
+    of a road graph.
+
+    === Attributes ===
+    @type rows: int
+    @type columns: int
+        The size of the grid of the road graph.
+    @type distance_hits: int
+        The number of distances found in the cache.
+    @type distance_misses: int
+        The number of distances found by a search.
+    """
+
+    manhattan = False
+
+    # === Private Attributes ===
+    # @type _digest: str
+    #     The SHA-256 hex digest of the road graph file.
+    # @type _successors: list[tuple[int]]
+    #     The intersections each intersection has a street to.
+    # @type _landmarks: list[int]
+    #     The landmark intersections.
+    # @type _from_landmarks: list[array[int]]
+    #     The distance from each landmark to every intersection.
+    # @type _to_landmarks: list[array[int]]
+    #     The distance from every intersection to each landmark.
+    # @type _distances: OrderedDict[(int, int), int]
+    #     Maps (origin, destination) pairs of intersections to their
+    #     distance, least recently used first.
+
+    def __init__(self, filename, landmarks=LANDMARKS,
+                 cache_directory=CACHE_DIRECTORY, cache_size=CACHE_SIZE):
+        """Initialize a RoadNetwork with the road graph file <filename>.
+
+        Raise ValueError if the file is not a valid road graph, or some
+        intersection cannot be reached from another.
+
+        @type self: RoadNetwork
+        @type filename: str
+        @type landmarks: int
+            The number of landmarks.
+            Precondition: landmarks > 0
+        @type cache_directory: str | None
+            The directory the landmark distances are cached in, or None to
+            not cache them.
+        @type cache_size: int
+            The largest number of distances and travel times cached.
+            Precondition: cache_size > 0
+        @rtype: None
+        """
+        self.rows, self.columns, removed = read_road_graph(filename)
+        super().__init__(max(self.rows, self.columns), cache_size)
+        self.distance_hits = 0
+        self.distance_misses = 0
+        self._distances = OrderedDict()
+        self._successors = self._streets(removed, False)
+        with open(filename, "rb") as file:
+            self._digest = hashlib.sha256(file.read()).hexdigest()
+
+        path = None
+        if cache_directory is not None:
+            digest = hashlib.sha256("{} {} {}".format(
+                self._digest, landmarks, _CACHE_VERSION).encode())
+            path = os.path.join(cache_directory, digest.hexdigest() + ".npz")
+            if os.path.exists(path) and \
+                    self._load_landmarks(path, landmarks):
+                return
+
+        self._choose_landmarks(landmarks, self._streets(removed, True))
+        if path is not None:
+            os.makedirs(cache_directory, exist_ok=True)
+            temporary = path + ".tmp"
+            with open(temporary, "wb") as file:
+                np.savez(file,
+                         landmarks=np.array(self._landmarks, dtype=np.intc),
+                         from_landmarks=np.array(self._from_landmarks,
+                                                 dtype=np.intc),
+                         to_landmarks=np.array(self._to_landmarks,
+                                               dtype=np.intc))
+            os.replace(temporary, path)
+
+    def distance(self, origin, destination):
+        """Return the length of the shortest drive from <origin> to
+        <destination>.
+
+        Raise ValueError if either location is outside the grid.
+
+        @type self: RoadNetwork
+        @type origin: Location
+        @type destination: Location
+        @rtype: int
+
+        >>> from location import Location
+        >>> network = RoadNetwork("roads.txt", cache_directory=None)
+        >>> network.distance(Location(1, 2), Location(1, 3))
+        3
+        >>> network.distance(Location(5, 5), Location(5, 4))
+        1
+        >>> network.distance(Location(5, 4), Location(5, 5))
+        3
+        >>> network.distance(Location(0, 0), Location(9, 9))
+        18
+        """
+        source = self._intersection(origin)
+        target = self._intersection(destination)
+        if source == target:
+            return 0
+        key = (source, target)
+        distance = self._distances.get(key)
+        if distance is not None:
+            self._distances.move_to_end(key)
+            self.distance_hits += 1
+            return distance
+        distance = self._search(source, target)
+        self._distances[key] = distance
+        if len(self._distances) > self._cache_size:
+            self._distances.popitem(last=False)
+        self.distance_misses += 1
+        return distance
+
+    def fingerprint(self):
+        """Return a string that differs between services that measure
+        distances differently.
+
+        @type self: RoadNetwork
+        @rtype: str
+        """
+        return "roads " + self._digest
+
+    def counters(self):
+        """Return the hit and miss counters.
+
+        @type self: RoadNetwork
+        @rtype: dict[str, int]
+        """
+        counters = super().counters()
+        counters["distance_hits"] = self.distance_hits
+        counters["distance_misses"] = self.distance_misses
+        return counters
+
+    def _intersection(self, location):
+        """Return the number of the intersection at <location>.
+
+        @type self: RoadNetwork
+        @type location: Location
+        @rtype: int
+        """
+        if not (0 <= location.row < self.rows and
+                0 <= location.column < self.columns):
+            raise ValueError("Location off the road graph: {}".format(
+                location))
+        return location.row * self.columns + location.column
+
+    def _streets(self, removed, reverse):
+        """Return the intersections each intersection has a street to, or
+        from if <reverse>, leaving out the <removed> streets.
+
+        @type self: RoadNetwork
+        @type removed: set[(int, int)]
+        @type reverse: bool
+        @rtype: list[tuple[int]]
+        """
+        columns = self.columns
+        streets = []
+        for row in range(self.rows):
+            for column in range(self.columns):
+                node = row * columns + column
+                neighbours = []
+                if row > 0:
+                    neighbours.append(node - columns)
+                if row < self.rows - 1:
+                    neighbours.append(node + columns)
+                if column > 0:
+                    neighbours.append(node - 1)
+                if column < columns - 1:
+                    neighbours.append(node + 1)
+                if reverse:
+                    streets.append(tuple(
+                        other for other in neighbours
+                        if (other, node) not in removed))
+                else:
+                    streets.append(tuple(
+                        other for other in neighbours
+                        if (node, other) not in removed))
+        return streets
+
+    def _load_landmarks(self, path, count):
+        """Read the landmarks and their distances from the cache file
+        <path>, and return True, or return False if it does not hold them
+        for <count> landmarks of this road graph.
+
+        @type self: RoadNetwork
+        @type path: str
+        @type count: int
+        @rtype: bool
+        """
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                landmarks = data["landmarks"]
+                from_landmarks = data["from_landmarks"]
+                to_landmarks = data["to_landmarks"]
+        except (OSError, ValueError, KeyError):
+            return False
+        size = len(self._successors)
+        shape = (min(count, size), size)
+        if landmarks.shape != shape[:1] or from_landmarks.shape != shape or \
+                to_landmarks.shape != shape or \
+                any(column.dtype != np.intc for column in
+                    [landmarks, from_landmarks, to_landmarks]) or \
+                np.any(landmarks < 0) or np.any(landmarks >= size) or \
+                np.any(from_landmarks < 0) or np.any(to_landmarks < 0):
+            return False
+        self._landmarks = landmarks.tolist()
+        self._from_landmarks = [array("i", row.tobytes())
+                                for row in from_landmarks]
+        self._to_landmarks = [array("i", row.tobytes())
+                              for row in to_landmarks]
+        return True
+
+    def _choose_landmarks(self, count, predecessors):
+        """Choose <count> landmarks far apart, and find the distances to and
+        from each of them.
+
+        The first landmark is the intersection at row 0 and column 0, and
+        each next one is the intersection farthest from the landmarks
+        chosen so far.
+
+        Raise ValueError if some intersection cannot be reached from
+        another.
+
+        @type self: RoadNetwork
+        @type count: int
+        @type predecessors: list[tuple[int]]
+            The intersections each intersection has a street from.
+        @rtype: None
+        """
+        self._landmarks = []
+        self._from_landmarks = []
+        self._to_landmarks = []
+        nearest = None
+        landmark = 0
+        for _ in range(min(count, len(self._successors))):
+            from_landmark = _breadth_first(self._successors, landmark)
+            to_landmark = _breadth_first(predecessors, landmark)
+            if -1 in from_landmark or -1 in to_landmark:
+                raise ValueError("Some intersections of the road graph "
+                                 "cannot be reached from others")
+            self._landmarks.append(landmark)
+            self._from_landmarks.append(from_landmark)
+            self._to_landmarks.append(to_landmark)
+            if nearest is None:
+                nearest = array("i", from_landmark)
+            else:
+                for node, distance in enumerate(from_landmark):
+                    if distance < nearest[node]:
+                        nearest[node] = distance
+            landmark = max(range(len(nearest)), key=nearest.__getitem__)
+
+    def _search(self, source, target):
+        """Return the length of the shortest drive from the intersection
+        <source> to the intersection <target>, by A* search.
+
+        @type self: RoadNetwork
+        @type source: int
+        @type target: int
+        @rtype: int
+        """
+        columns = self.columns
+        target_row, target_column = divmod(target, columns)
+        # Only the landmarks that bound the distance from <source> best are
+        # used, since every landmark used slows down every step.
+        bounds = sorted(
+            ((from_landmark, to_landmark, from_landmark[target],
+              to_landmark[target])
+             for from_landmark, to_landmark in
+             zip(self._from_landmarks, self._to_landmarks)),
+            key=lambda bound: max(bound[2] - bound[0][source],
+                                  bound[1][source] - bound[3]),
+            reverse=True)[:ACTIVE_LANDMARKS]
+
+        def lower_bound(node):
+            row, column = divmod(node, columns)
+            bound = abs(row - target_row) + abs(column - target_column)
+            for from_landmark, to_landmark, landmark_to_target, \
+                    target_to_landmark in bounds:
+                # The triangle inequality through each landmark.
+                bound = max(bound, landmark_to_target - from_landmark[node],
+                            to_landmark[node] - target_to_landmark)
+            return bound
+
+        # The frontier holds (bound, -distance, intersection): among the
+        # intersections with the same bound, the farthest from <source> is
+        # expanded first, since on a grid many shortest drives tie.
+        distances = {source: 0}
+        frontier = [(lower_bound(source), 0, source)]
+        while frontier:
+            _, distance, node = heapq.heappop(frontier)
+            distance = -distance
+            if node == target:
+                return distance
+            if distance > distances[node]:
+                continue
+            distance += 1
+            for other in self._successors[node]:
+                if distance < distances.get(other, sys.maxsize):
+                    distances[other] = distance
+                    heapq.heappush(frontier,
+                                   (distance + lower_bound(other), -distance,
+                                    other))
+        raise ValueError("No road from {} to {}".format(
+            divmod(source, columns), divmod(target, columns)))
+
+
+def _breadth_first(streets, source):
+    """Return the distance from the intersection <source> to every
+    intersection, or -1 for those that cannot be reached, following
+    <streets>.
+
+    @type streets: list[tuple[int]]
+    @type source: int
+    @rtype: array[int]
+    """
+    distances = array("i", [-1]) * len(streets)
+    distances[source] = 0
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        distance = distances[node] + 1
+        for other in streets[node]:
+            if distances[other] < 0:
+                distances[other] = distance
+                queue.append(other)
+    return distances
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Precompute and cache the landmarks of a road graph.")
+    parser.add_argument("--landmarks", type=int, default=LANDMARKS,
+                        help="number of landmarks")
+    parser.add_argument("--cache", default=CACHE_DIRECTORY,
+                        help="directory of cached landmarks")
+    parser.add_argument("file", help="road graph file")
+    arguments = parser.parse_args()
+
+    network = RoadNetwork(arguments.file, arguments.landmarks, arguments.cache)
+    print("{} x {} road graph, {} landmarks cached in {}".format(
+        network.rows, network.columns, arguments.landmarks, arguments.cache))
@@ -0,0 +1,525 @@
+"""
+The sharding module runs a simulation in parallel by splitting the grid
+into regions, each simulated by its own event loop in its own process.
+
+The grid is divided into horizontal strips of <block_size> rows, one per
+shard, with the last strip also holding every row beyond. Drivers and
+riders are simulated by the shard that owns the strip of their location:
+a driver request goes to the shard of the driver, and a rider request to
+the shard of the rider's origin. Each shard's dispatcher only knows the
+drivers in its own region, so riders are matched with the closest idle
+driver in their region.
+
+When a ride ends in another region, the shard where the rider was picked up
+hands the dropoff, with its driver and rider, over to the shard of the
+destination, and unregisters the driver. The destination shard does the
+dropoff, and the driver requests its next rider there.
+
+The shards are kept in step conservatively. They all simulate a window of
+time, then exchange the dropoffs handed over, then move on to the next
+window. Only a ride to another region is handed over, and it takes at
+least the travel time of its Manhattan distance at the speed of the
+fastest driver. The window is no longer than that travel time for any
+rider to another region that may be picked up during it, so a dropoff
+handed over during a window never falls inside it. When that travel time
+rounds down to 0, the windows are one timestamp long, and the shards
+exchange dropoffs in rounds until no more fall inside the window. A shard
+with nothing to do in a window is not sent the round.
+
+Events with the same timestamp are done in the order they were created, by
+their creation time, the region that created them and how many events that
+region had created, so a dropoff handed over takes the same place among
+them whichever window or round it arrives in.
+
+Every activity is recorded with its timestamp and the round it was done
+in, and the activities of all the shards are merged in that order into a
+single Monitor, whose report is that of the whole city. With a single shard,
+the report is the same as that of Simulation.run. With more, it only
+differs because riders are matched with drivers in their own region.
+"""
+import heapq
+import multiprocessing
+from collections import deque
+
+from container import PriorityQueue
+from dispatcher import Dispatcher
+from event import DriverRequest, RiderRequest, Dropoff
+from location import manhattan_distance
+from monitor import Monitor
+from travel import get_travel_times, set_travel_times
+
+# The longest window, in simulated time, used when no ride limits it.
+MAX_WINDOW = 64
+
+
+def region_of(location, block_size, shards):
+    """Return the shard that owns <location>.
+
+    Each shard owns a strip of <block_size> rows, in order, and the last
+    shard also owns the rows beyond, so that every region is contiguous.
+
+    @type location: Location
+    @type block_size: int
+    @type shards: int
+    @rtype: int
+
+    >>> from location import Location
+    >>> [region_of(Location(row, 7), 10, 3) for row in [0, 9, 10, 25, 90]]
+    [0, 0, 1, 2, 2]
+    """
+    return min(location.row // block_size, shards - 1)
+
+
+def run_sharded(initial_events, shards, block_size, monitor=None,
+                processes=True):
+    """Run a simulation of <initial_events> split into <shards> regions,
+    and return the report of <monitor>, which is notified of every activity
+    of every region.
+
+    @type initial_events: iterable[Event]
+        Precondition: the events are in non-decreasing timestamp order.
+    @type shards: int
+        The number of regions, each simulated in its own process.
+    @type block_size: int
+        The number of rows of the region of each shard but the last.
+    @type monitor: Monitor | None
+        The monitor to notify. A new Monitor is used if this is None.
+    @type processes: bool
+        Whether to run the shards in their own processes, rather than one
+        after another in this process.
+    @rtype: dict[str, object]
+
+    >>> from event import iter_events
+    >>> from simulation import Simulation
+    >>> from workload import Workload
+    >>> run_sharded(iter_events("events.txt"), 1, 10, processes=False) == \\
+    ...     Simulation().run(iter_events("events.txt"), stream=True)
+    True
+    >>> run_sharded(Workload(3000, rate=5), 3, 34) == \\
+    ...     run_sharded(Workload(3000, rate=5), 3, 34, processes=False)
+    True
+
+    The report does not depend on the length of the windows, even when
+    every window is one timestamp long.
+
+    >>> import sys
+    >>> module = sys.modules[run_sharded.__module__]
+    >>> report = run_sharded(Workload(3000, rate=5, seed=3), 2, 50,
+    ...                      processes=False)
+    >>> module.MAX_WINDOW = 1
+    >>> run_sharded(Workload(3000, rate=5, seed=3), 2, 50,
+    ...             processes=False) == report
+    True
+    >>> module.MAX_WINDOW = 64
+    """
+    if monitor is None:
+        monitor = Monitor()
+    if processes:
+        workers = [_Worker(region, shards, block_size)
+                   for region in range(shards)]
+    else:
+        workers = [_Shard(region, shards, block_size)
+                   for region in range(shards)]
+    try:
+        records = _coordinate(iter(initial_events), workers, shards,
+                              block_size)
+    finally:
+        for worker in workers:
+            worker.close()
+    records.sort(key=lambda record: record[0])
+    for _, activity in records:
+        monitor.notify(*activity)
+    return monitor.report()
+
+
+def _coordinate(initial_events, workers, shards, block_size):
+    """Step <workers> through the simulation of <initial_events>, and
+    return the activities they record.
+
+    @type initial_events: iterator[Event]
+    @type workers: list[_Shard | _Worker]
+    @type shards: int
+    @type block_size: int
+    @rtype: list[((int, int, int), tuple)]
+    """
+    pending = deque()
+    handed_over = []
+    records = []
+    # The distance and the time by which each rider going to another region
+    # must be picked up, shortest first, and the speed of the fastest driver.
+    crossings = []
+    fastest = None
+    next_times = [None] * shards
+    round_number = 0
+    exhausted = False
+    while True:
+        if not exhausted and not pending:
+            event = next(initial_events, None)
+            if event is None:
+                exhausted = True
+            else:
+                pending.append(event)
+                fastest = _track(event, crossings, fastest, block_size,
+                                 shards)
+        candidates = [time for time in next_times if time is not None]
+        candidates.extend(event.timestamp for _, event in handed_over)
+        if pending:
+            candidates.append(pending[0].timestamp)
+        if not candidates:
+            return records
+        start = min(candidates)
+        while crossings and crossings[0][1] <= start:
+            heapq.heappop(crossings)
+
+        # Pull the initial events in the window, shortening the window when
+        # a faster driver or a shorter ride to another region arrives.
+        end = start + _lookahead(crossings, fastest)
+        while not exhausted and pending[-1].timestamp < end:
+            event = next(initial_events, None)
+            if event is None:
+                exhausted = True
+                break
+            if event.timestamp < pending[-1].timestamp:
+                raise ValueError("Sharded events must be in timestamp "
+                                 "order: {}".format(event))
+            pending.append(event)
+            fastest = _track(event, crossings, fastest, block_size, shards)
+            end = min(end, start + _lookahead(crossings, fastest))
+        initial = [[] for _ in range(shards)]
+        while pending and pending[0].timestamp < end:
+            event = pending.popleft()
+            initial[_region_of_event(event, block_size, shards)].append(event)
+
+        # Simulate the window, in more rounds while dropoffs handed over
+        # fall inside it.
+        while True:
+            inbound = [[] for _ in range(shards)]
+            for key, event in handed_over:
+                inbound[region_of(event.rider.destination, block_size,
+                                  shards)].append((key, event))
+            active = [region for region in range(shards)
+                      if initial[region] or inbound[region] or
+                      (next_times[region] is not None and
+                       next_times[region] < end)]
+            for region in active:
+                workers[region].send_advance(end, round_number,
+                                             initial[region],
+                                             inbound[region])
+            handed_over = []
+            for region in active:
+                outbound, next_times[region], shard_records = \
+                    workers[region].receive_advance()
+                handed_over.extend(outbound)
+                records.extend(shard_records)
+            initial = [[] for _ in range(shards)]
+            round_number += 1
+            if all(event.timestamp >= end for _, event in handed_over):
+                break
+
+
+def _track(event, crossings, fastest, block_size, shards):
+    """Record the ride of the initial <event> in <crossings> if it goes to
+    another region, and return the speed of the fastest driver, <fastest>,
+    updated with the driver of <event>.
+
+    @type event: DriverRequest | RiderRequest
+    @type crossings: list[(int, int)]
+    @type fastest: int | None
+    @type block_size: int
+    @type shards: int
+    @rtype: int | None
+    """
+    if isinstance(event, DriverRequest):
+        if fastest is None or event.driver.speed > fastest:
+            return event.driver.speed
+    # Pickup.do only picks a rider up before the time of its patience.
+    elif isinstance(event, RiderRequest) and \
+            event.timestamp < event.rider.patience and \
+            region_of(event.rider.origin, block_size, shards) != \
+            region_of(event.rider.destination, block_size, shards):
+        heapq.heappush(crossings, (
+            manhattan_distance(event.rider.origin, event.rider.destination),
+            event.rider.patience))
+    return fastest
+
+
+def _lookahead(crossings, fastest):
+    """Return the length of a window that no ride in <crossings> can
+    finish within, if it starts during the window and the fastest driver
+    has speed <fastest>.
+
+    @type crossings: list[(int, int)]
+    @type fastest: int | None
+    @rtype: int
+
+    >>> _lookahead([(9, 40)], 2), _lookahead([(1, 40)], 3), _lookahead([], 3)
+    (4, 1, 64)
+    """
+    if not crossings or fastest is None:
+        return MAX_WINDOW
+    return max(min(round(crossings[0][0] / fastest), MAX_WINDOW), 1)
+
+
+def _region_of_event(event, block_size, shards):
+    """Return the shard that simulates the initial <event>.
+
+    @type event: DriverRequest | RiderRequest
+    @type block_size: int
+    @type shards: int
+    @rtype: int
+    """
+    if isinstance(event, DriverRequest):
+        return region_of(event.driver.location, block_size, shards)
+    return region_of(event.rider.origin, block_size, shards)
+
+
+class _RecordingMonitor(Monitor):
+    """A monitor that only records the activities it is notified about, in
+    order, for a shard to send to the coordinator.
+
+    === Attributes ===
+    @type records: list[((int, int, int), tuple)]
+        The sort key and notify arguments of each activity since they were
+        last taken.
+    @type round_number: int
+        The round the shard is simulating.
+    """
+
+    # === Private Attributes ===
+    # @type _count: int
+    #     The number of activities recorded, which orders the activities
+    #     recorded in the same round at the same timestamp.
+
+    def __init__(self):
+        """Initialize a _RecordingMonitor.
+
+        @type self: _RecordingMonitor
+        @rtype: None
+        """
+        super().__init__()
+        self.records = []
+        self.round_number = 0
+        self._count = 0
+
+    def notify(self, timestamp, category, description, identifier, location):
+        """Record the activity.
+
+        @type self: _RecordingMonitor
+        @type timestamp: int
+        @type category: DRIVER | RIDER
+        @type description: REQUEST | CANCEL | PICKUP | DROP_OFF
+        @type identifier: str
+        @type location: Location
+        @rtype: None
+        """
+        self.records.append(((timestamp, self.round_number, self._count),
+                             (timestamp, category, description, identifier,
+                              location)))
+        self._count += 1
+
+
+class _Shard:
+    """The event loop of one region.
+
+    Initial events are done before queued events with the same timestamp,
+    as in Simulation.run.
+    """
+
+    # === Private Attributes ===
+    # @type _region: int
+    # @type _shards: int
+    # @type _block_size: int
+    #     The region of this shard, and how the grid is divided.
+    # @type _events: PriorityQueue[(int, (int, int, int), Event)]
+    #     The events spawned in this region and not done yet, with their
+    #     timestamp and the key they were created with.
+    # @type _created: int
+    #     The number of events this region has created.
+    # @type _initial: deque[Event]
+    #     The initial events of the window being simulated.
+    # @type _dispatcher: Dispatcher
+    #     The dispatcher of the drivers in this region.
+    # @type _monitor: _RecordingMonitor
+    #     The record of the activities in this region.
+    # @type _outbound: list[((int, int, int), Dropoff)]
+    #     The dropoffs handed over to other regions in this round, with the
+    #     key they were created with.
+    # @type _result: tuple
+    #     The result of the last round, until it is received.
+
+    def __init__(self, region, shards, block_size):
+        """Initialize the _Shard for <region>.
+
+        @type self: _Shard
+        @type region: int
+        @type shards: int
+        @type block_size: int
+        @rtype: None
+        """
+        self._region = region
+        self._shards = shards
+        self._block_size = block_size
+        self._events = PriorityQueue()
+        self._created = 0
+        self._initial = deque()
+        self._dispatcher = Dispatcher()
+        self._monitor = _RecordingMonitor()
+        self._outbound = []
+        self._result = None
+
+    def send_advance(self, end, round_number, initial, inbound):
+        """Add <initial> and the dropoffs <inbound> handed over to this
+        region, and simulate every event before <end>.
+
+        @type self: _Shard
+        @type end: int
+        @type round_number: int
+        @type initial: list[Event]
+        @type inbound: list[((int, int, int), Dropoff)]
+            The dropoffs, with the key they were created with.
+        @rtype: None
+        """
+        self._monitor.round_number = round_number
+        self._initial.extend(initial)
+        for key, event in inbound:
+            self._events.add((event.timestamp, key, event))
+        while True:
+            queued = None if self._events.is_empty() else \
+                self._events.peek()[0]
+            if self._initial and (queued is None or
+                                  self._initial[0].timestamp <= queued):
+                if self._initial[0].timestamp >= end:
+                    break
+                event = self._initial.popleft()
+            elif queued is not None and queued < end:
+                event = self._events.remove()[2]
+            else:
+                break
+            if not event.cancelled:
+                for new_event in event.do(self._dispatcher, self._monitor):
+                    self._schedule(new_event, event.timestamp)
+
+        next_time = None
+        if self._initial:
+            next_time = self._initial[0].timestamp
+        if not self._events.is_empty() and (
+                next_time is None or self._events.peek()[0] < next_time):
+            next_time = self._events.peek()[0]
+        self._result = (self._outbound, next_time, self._monitor.records)
+        self._outbound = []
+        self._monitor.records = []
+
+    def receive_advance(self):
+        """Return the dropoffs handed over by the last round, the time of
+        the next event of this region, or None if there is none, and the
+        activities recorded.
+
+        @type self: _Shard
+        @rtype: (list[((int, int, int), Dropoff)], int | None, list)
+        """
+        result = self._result
+        self._result = None
+        return result
+
+    def close(self):
+        """Release the resources of this shard.
+
+        @type self: _Shard
+        @rtype: None
+        """
+
+    def _schedule(self, event, now):
+        """Add <event>, created at time <now>, to the event queue, or hand
+        it over if it is a dropoff in another region.
+
+        @type self: _Shard
+        @type event: Event
+        @type now: int
+        @rtype: None
+        """
+        key = (now, self._region, self._created)
+        self._created += 1
+        if isinstance(event, Dropoff) and \
+                region_of(event.rider.destination, self._block_size,
+                          self._shards) != self._region:
+            self._dispatcher.unregister(event.driver)
+            self._outbound.append((key, event))
+        else:
+            self._events.add((event.timestamp, key, event))
+
+
+class _Worker:
+    """A _Shard running in its own process, with the same interface."""
+
+    # === Private Attributes ===
+    # @type _connection: multiprocessing.connection.Connection
+    #     The end of the pipe to the process.
+    # @type _process: multiprocessing.Process
+    #     The process running the shard.
+
+    def __init__(self, region, shards, block_size):
+        """Start the process running the _Shard for <region>, with the
+        travel time service in use.
+
+        @type self: _Worker
+        @type region: int
+        @type shards: int
+        @type block_size: int
+        @rtype: None
+        """
+        self._connection, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_serve, args=(child, region, shards, block_size,
+                                 get_travel_times()),
+            daemon=True)
+        self._process.start()
+        child.close()
+
+    def send_advance(self, end, round_number, initial, inbound):
+        """Start the shard simulating a round, as _Shard.send_advance.
+
+        @type self: _Worker
+        @rtype: None
+        """
+        self._connection.send((end, round_number, initial, inbound))
+
+    def receive_advance(self):
+        """Return the result of the round, as _Shard.receive_advance.
+
+        @type self: _Worker
+        @rtype: (list[((int, int, int), Dropoff)], int | None, list)
+        """
+        return self._connection.recv()
+
+    def close(self):
+        """Stop the process.
+
+        @type self: _Worker
+        @rtype: None
+        """
+        self._connection.send(None)
+        self._connection.close()
+        self._process.join()
+
+
+def _serve(connection, region, shards, block_size, travel_times):
+    """Run the _Shard for <region> with the travel time service
+    <travel_times>, simulating each round received from <connection> and
+    sending back its result, until None is received.
+
+    @type connection: multiprocessing.connection.Connection
+    @type region: int
+    @type shards: int
+    @type block_size: int
+    @type travel_times: TravelTimes
+    @rtype: None
+    """
+    set_travel_times(travel_times)
+    shard = _Shard(region, shards, block_size)
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        shard.send_advance(*message)
+        connection.send(shard.receive_advance())
+    connection.close()
@@ -1,7 +1,16 @@
+import itertools
+
+from checkpoint import load_checkpoint
 from container import PriorityQueue
 from dispatcher import Dispatcher
-from event import Event, create_event_list
+from event import Event, create_pickups, iter_events
 from monitor import Monitor
+from travel import set_travel_times
+
+# The fraction of the event queue that must be cancelled events before the
+# queue is compacted, and the smallest queue size at which it is checked.
+COMPACTION_RATIO = 0.5
+MIN_COMPACTION_SIZE = 1024
 
 
 class Simulation:
@@ -22,46 +31,363 @@ class Simulation:
     """
 
     # === Private Attributes ===
-    # @type _events: PriorityQueue[Event]
+    # @type _events: PriorityQueue[Event] | CalendarQueue[Event]
     #     A sequence of events arranged in priority determined by the event
     #     sorting order.
     # @type _dispatcher: Dispatcher
     #     The dispatcher associated with the simulation.
+    # @type _monitor: Monitor
+    #     The monitor associated with the simulation.
+    # @type _observer: Monitor
+    #     The monitor the events notify: the monitor, or the checkpointer's
+    #     recorder of the activities of the monitor.
+    # @type _next_compaction: int
+    #     The size of the event queue at which it is next checked for
+    #     cancelled events.
+    # @type _profiler: Profiler | None
+    #     The profiler that records the cost of the simulation, if any.
+    # @type _checkpointer: Checkpointer | None
+    #     The checkpointer that saves the state of the simulation, if any.
 
-    def __init__(self):
+    def __init__(self, event_queue=None, dispatcher=None, monitor=None,
+                 profiler=None, checkpointer=None):
         """Initialize a Simulation.
 
         @type self: Simulation
+        @type event_queue: Container | None
+            The empty queue used to schedule events, such as a
+            CalendarQueue. A PriorityQueue is used if this is None.
+        @type dispatcher: Dispatcher | None
+            The dispatcher to use, such as Dispatcher(Fleet()). A new
+            Dispatcher is used if this is None.
+        @type monitor: Monitor | None
+            The monitor to use, such as a StreamingMonitor. A new Monitor
+            is used if this is None.
+        @type profiler: Profiler | None
+            A profiler to record the cost of each event and dispatcher
+            lookup, or None to not profile the simulation.
+        @type checkpointer: Checkpointer | None
+            A checkpointer to periodically save the state of the simulation,
+            or None to not save it. A profiled simulation cannot be
+            checkpointed.
         @rtype: None
         """
-        self._events = PriorityQueue()
-        self._dispatcher = Dispatcher()
-        self._monitor = Monitor()
+        if profiler is not None and checkpointer is not None:
+            raise ValueError("A profiled simulation cannot be checkpointed")
+        if event_queue is None:
+            event_queue = PriorityQueue()
+        if dispatcher is None:
+            dispatcher = Dispatcher()
+        if monitor is None:
+            monitor = Monitor()
+        self._events = event_queue
+        self._dispatcher = dispatcher
+        self._monitor = monitor
+        self._observer = monitor
+        self._next_compaction = MIN_COMPACTION_SIZE
+        self._profiler = profiler
+        if profiler is not None:
+            profiler.instrument(dispatcher)
+        self._checkpointer = checkpointer
+
+    def __getstate__(self):
+        """Return the state of this simulation to pickle, without its
+        checkpointer or monitor, whose activities are logged by the
+        checkpointer instead.
+
+        @type self: Simulation
+        @rtype: dict[str, object]
+        """
+        state = self.__dict__.copy()
+        state["_checkpointer"] = None
+        state["_monitor"] = None
+        state["_observer"] = None
+        return state
 
-    def run(self, initial_events):
+    def run(self, initial_events, stream=False):
         """Run the simulation on the list of events in <initial_events>.
 
         Return a dictionary containing statistics of the simulation,
         according to the specifications in the assignment handout.
 
+        If <stream> is True, <initial_events> may be any iterable, such as
+        iter_events(filename), and each initial event is only pulled from it
+        once the simulation reaches its timestamp, so the event queue only
+        holds the events spawned by the simulation itself.
+
+        If the dispatcher is in batch mode, the waiting riders and idle
+        drivers are matched once all of the events at each timestamp have
+        been done.
+
+        If the simulation has a profiler, it records the cost of the run,
+        and writes its summary at the end of the run. If the simulation has
+        a checkpointer, it periodically saves the state of the run, which
+        can be continued with resume().
+
+        The events are done one timestamp at a time: every event at the
+        earliest timestamp is drained from the queue at once and done in
+        FIFO order, followed by the events they spawn at the same timestamp,
+        and the events they spawn for later timestamps are added to the
+        queue together. This does the events in exactly the order they
+        would be removed from the queue one at a time.
+
+        Cancelled events are discarded without being done. Whenever the
+        event queue doubles in size, it is compacted if at least
+        COMPACTION_RATIO of its events are cancelled.
+
         @type self: Simulation
-        @type initial_events: list[Event]
+        @type initial_events: list[Event] | iterable[Event]
             An initial list of events.
+            Precondition: if <stream> is True, the events are in
+            non-decreasing timestamp order.
+        @type stream: bool
+            Whether to pull the initial events lazily.
         @rtype: dict[str, object]
         """
-        for event in initial_events:
-            self._events.add(event)
+        self._start_recording()
+        if stream:
+            self._run_stream(iter(initial_events))
+            return self._end_run()
 
+        self._events.extend(initial_events)
+        self._next_compaction = max(2 * len(self._events), MIN_COMPACTION_SIZE)
+        self._run_queue()
+        return self._end_run()
+
+    def _run_queue(self):
+        """Run the simulation until the event queue is empty.
+
+        @type self: Simulation
+        @rtype: None
+        """
         while not self._events.is_empty():
-            event_outcome = self._events.remove().do(self._dispatcher,self._monitor)
+            timestamp = self._do_batch(self._events.remove_ties())
+            if self._dispatcher.batch:
+                self._match_batch(timestamp, None)
+            if self._checkpointer is not None:
+                self._checkpointer.reached(self, timestamp)
+
+    def _run_stream(self, initial_events, pulled=0, next_initial=None):
+        """Run the simulation, pulling events from <initial_events> as the
+        simulation reaches their timestamps.
+
+        The initial events at a timestamp are done before any queued event
+        with the same timestamp, the same order as when all of the initial
+        events are added to the queue up front.
+
+        @type self: Simulation
+        @type initial_events: iterator[Event]
+        @type pulled: int
+            The number of initial events already pulled, when resuming.
+        @type next_initial: Event | None
+            The initial event pulled but not done yet, when resuming.
+        @rtype: None
+        """
+        if pulled == 0:
+            next_initial = next(initial_events, None)
+            pulled = 1
+        while next_initial is not None or not self._events.is_empty():
+            if next_initial is not None and (
+                    self._events.is_empty() or
+                    next_initial.timestamp <= self._events.peek().timestamp):
+                batch = []
+                timestamp = next_initial.timestamp
+                while next_initial is not None and \
+                        next_initial.timestamp == timestamp:
+                    batch.append(next_initial)
+                    next_initial = next(initial_events, None)
+                    pulled += 1
+                if next_initial is not None and \
+                        next_initial.timestamp < timestamp:
+                    raise ValueError("Streamed events must be in timestamp "
+                                     "order: {}".format(next_initial))
+                if not self._events.is_empty() and \
+                        self._events.peek().timestamp == timestamp:
+                    batch.extend(self._events.remove_ties())
+            else:
+                batch = self._events.remove_ties()
+            timestamp = self._do_batch(batch)
+            if self._dispatcher.batch:
+                self._match_batch(timestamp, next_initial)
+            if self._checkpointer is not None:
+                self._checkpointer.reached(self, timestamp, pulled,
+                                           next_initial)
+
+    def _do_batch(self, batch):
+        """Do the events in <batch>, which all have the same timestamp, in
+        order, followed by the events they spawn at that timestamp, and add
+        the events they spawn for later timestamps to the event queue.
+
+        Return the timestamp of the batch.
+
+        @type self: Simulation
+        @type batch: list[Event]
+            Precondition: batch is not empty.
+        @rtype: int
+        """
+        timestamp = batch[0].timestamp
+        later = []
+        # Events appended to the batch while it is being done are done in
+        # turn, in the order they were spawned.
+        for event in batch:
+            if event.cancelled:
+                if self._profiler is not None:
+                    self._profiler.record_dead(event)
+                continue
+            if self._profiler is None:
+                event_outcome = event.do(self._dispatcher, self._observer)
+            else:
+                event_outcome = self._profiler.do(event, self._dispatcher,
+                                                  self._observer)
             for new_event in event_outcome:
-                self._events.add(new_event)
+                if new_event.timestamp == timestamp:
+                    batch.append(new_event)
+                else:
+                    later.append(new_event)
+        self._events.extend(later)
+        if self._profiler is not None:
+            self._profiler.record_depth(timestamp, len(self._events))
+        if len(self._events) >= self._next_compaction:
+            self._compact_events()
+        return timestamp
+
+    def _start_recording(self):
+        """Have the checkpointer, if any, record the activities of the
+        monitor from now on.
 
+        @type self: Simulation
+        @rtype: None
+        """
+        self._observer = self._monitor
+        if self._checkpointer is not None:
+            self._observer = self._checkpointer.record(self._monitor)
+
+    def _end_run(self):
+        """Finish the run and return the monitor's report.
+
+        @type self: Simulation
+        @rtype: dict[str, object]
+        """
+        if self._profiler is not None:
+            self._profiler.end_run()
+        if self._checkpointer is not None:
+            self._checkpointer.wait()
         return self._monitor.report()
 
+    def _match_batch(self, timestamp, next_initial):
+        """If every event at <timestamp> has been done, have the dispatcher
+        match the waiting riders with the idle drivers, and schedule the
+        resulting pickups.
+
+        @type self: Simulation
+        @type timestamp: int
+        @type next_initial: Event | None
+            The next initial event still to be pulled, when streaming.
+        @rtype: None
+        """
+        if next_initial is not None and next_initial.timestamp == timestamp:
+            return
+        if not self._events.is_empty() and \
+                self._events.peek().timestamp == timestamp:
+            return
+        for new_event in create_pickups(timestamp,
+                                        self._dispatcher.match_batch()):
+            self._events.add(new_event)
+
+    def _compact_events(self):
+        """Remove the cancelled events from the event queue if enough of its
+        events are cancelled, and set the size for the next check.
+
+        @type self: Simulation
+        @rtype: None
+        """
+        removed = self._events.compact(_is_cancelled, COMPACTION_RATIO)
+        if self._profiler is not None:
+            self._profiler.record_compaction(removed)
+        self._next_compaction = max(2 * len(self._events), MIN_COMPACTION_SIZE)
+
+
+def resume(filename, initial_events=None, checkpointer=None):
+    """Continue the simulation saved to the checkpoint file <filename> and
+    return its report, which is the same as that of the uninterrupted run.
+
+    The travel time service the checkpointed run used is used from now on.
+
+    @type filename: str
+    @type initial_events: iterable[Event] | None
+        If the checkpointed run streamed its initial events, the same
+        initial events again, such as iter_events(filename). The events
+        already pulled by the checkpointed run are skipped.
+    @type checkpointer: Checkpointer | None
+        A checkpointer to keep saving the state of the continued run.
+    @rtype: dict[str, object]
+
+    >>> import os, tempfile
+    >>> from checkpoint import Checkpointer
+    >>> path = os.path.join(tempfile.mkdtemp(), "checkpoint")
+    >>> checkpointer = Checkpointer(path, 5)
+    >>> report = Simulation(checkpointer=checkpointer).run(
+    ...     iter_events("events.txt"), stream=True)
+    >>> checkpointer.saved > 0
+    True
+    >>> resume(path, iter_events("events.txt")) == report
+    True
+
+    A run resumed with a checkpointer on the same file can crash before it
+    saves a checkpoint of its own and still be resumed again.
+
+    >>> from workload import Workload
+    >>> def crash(events, count):
+    ...     yield from itertools.islice(events, count)
+    ...     raise RuntimeError("crash")
+    >>> report = Simulation().run(Workload(2000), stream=True)
+    >>> checkpointer = Checkpointer(path, 50)
+    >>> Simulation(checkpointer=checkpointer).run(
+    ...     crash(iter(Workload(2000)), 1000), stream=True)
+    Traceback (most recent call last):
+    RuntimeError: crash
+    >>> checkpointer.wait()
+    >>> checkpointer = Checkpointer(path, 50)
+    >>> pulled = load_checkpoint(path)["pulled"]
+    >>> resume(path, crash(iter(Workload(2000)), pulled + 5), checkpointer)
+    Traceback (most recent call last):
+    RuntimeError: crash
+    >>> checkpointer.wait()
+    >>> checkpointer.saved
+    0
+    >>> resume(path, Workload(2000)) == report
+    True
+    """
+    state = load_checkpoint(filename)
+    set_travel_times(state["travel_times"])
+    simulation = state["simulation"]
+    simulation._monitor = state["monitor"]
+    simulation._checkpointer = checkpointer
+    simulation._start_recording()
+    pulled = state["pulled"]
+    if pulled is None:
+        simulation._run_queue()
+    else:
+        if initial_events is None:
+            raise ValueError("The checkpointed run streamed its initial "
+                             "events, so they must be given again")
+        initial_events = iter(initial_events)
+        for _ in itertools.islice(initial_events, pulled):
+            pass
+        simulation._run_stream(initial_events, pulled, state["next_initial"])
+    return simulation._end_run()
+
+
+def _is_cancelled(event):
+    """Return True iff <event> has been cancelled.
+
+    @type event: Event
+    @rtype: bool
+    """
+    return event.cancelled
+
 
 if __name__ == "__main__":
-    events = create_event_list("events.txt")
     sim = Simulation()
-    final_stats = sim.run(events)
+    final_stats = sim.run(iter_events("events.txt"), stream=True)
     print(final_stats)
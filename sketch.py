@@ -0,0 +1,196 @@
+"""
+The sketch module contains summaries of a stream of values that take
+bounded memory and can be merged: QuantileSketch, for approximate
+percentiles, and Histogram, for counts in fixed buckets.
+"""
+import math
+from bisect import bisect_right
+
+
+class QuantileSketch:
+    """A mergeable sketch of a stream of non-negative numbers that answers
+    quantile queries with bounded relative error.
+
+    Values are counted in buckets whose bounds grow geometrically, so that
+    every value in a bucket is within <relative_accuracy> of the bucket's
+    representative value. If there are more than <max_buckets> buckets, the
+    lowest buckets are merged, which only loses accuracy for the smallest
+    values.
+
+    === Attributes ===
+    @type count: int
+        The number of values added.
+    """
+
+    # === Private Attributes ===
+    # @type _relative_accuracy: float
+    #     The relative accuracy of the quantiles.
+    # @type _gamma: float
+    #     The ratio between the bounds of consecutive buckets.
+    # @type _max_buckets: int
+    #     The largest number of buckets kept.
+    # @type _buckets: dict[int, int]
+    #     Maps the index i of each bucket, which holds the values in
+    #     (_gamma ** (i - 1), _gamma ** i], to the number of values in it.
+    # @type _zero_count: int
+    #     The number of values equal to 0.
+    # @type _min: float
+    # @type _max: float
+    #     The smallest and largest values added.
+
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048):
+        """Initialize an empty QuantileSketch.
+
+        @type self: QuantileSketch
+        @type relative_accuracy: float
+            Precondition: 0 < relative_accuracy < 1
+        @type max_buckets: int
+            Precondition: max_buckets > 1
+        @rtype: None
+        """
+        self._relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._max_buckets = max_buckets
+        self._buckets = {}
+        self._zero_count = 0
+        self.count = 0
+        self._min = math.inf
+        self._max = -math.inf
+
+    def add(self, value):
+        """Add <value> to this QuantileSketch.
+
+        @type self: QuantileSketch
+        @type value: float
+            Precondition: value >= 0
+        @rtype: None
+        """
+        self.count += 1
+        self._min = min(self._min, value)
+        self._max = max(self._max, value)
+        if value <= 0:
+            self._zero_count += 1
+            return
+        index = math.ceil(math.log(value, self._gamma))
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+        if len(self._buckets) > self._max_buckets:
+            self._collapse()
+
+    def merge(self, other):
+        """Add every value summarized by <other> to this QuantileSketch.
+
+        Precondition: <other> has the same relative accuracy.
+
+        @type self: QuantileSketch
+        @type other: QuantileSketch
+        @rtype: None
+        """
+        for index, count in other._buckets.items():
+            self._buckets[index] = self._buckets.get(index, 0) + count
+        self._zero_count += other._zero_count
+        self.count += other.count
+        self._min = min(self._min, other._min)
+        self._max = max(self._max, other._max)
+        while len(self._buckets) > self._max_buckets:
+            self._collapse()
+
+    def quantile(self, fraction):
+        """Return an estimate of the value below which <fraction> of the
+        values fall, or None if no values have been added.
+
+        @type self: QuantileSketch
+        @type fraction: float
+            Precondition: 0 <= fraction <= 1
+        @rtype: float | None
+
+        >>> sketch = QuantileSketch()
+        >>> for value in range(1, 101):
+        ...     sketch.add(value)
+        >>> abs(sketch.quantile(0.5) - 50) <= 0.5 * 0.02 * 50 + 1
+        True
+        >>> sketch.quantile(1.0)
+        100
+        """
+        if self.count == 0:
+            return None
+        rank = fraction * (self.count - 1)
+        seen = self._zero_count
+        if rank < seen:
+            return 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if rank < seen:
+                estimate = 2 * self._gamma ** index / (self._gamma + 1)
+                return min(max(estimate, self._min), self._max)
+        return self._max
+
+    def _collapse(self):
+        """Merge the two lowest buckets.
+
+        @type self: QuantileSketch
+        @rtype: None
+        """
+        lowest, second = sorted(self._buckets)[:2]
+        self._buckets[second] += self._buckets.pop(lowest)
+
+
+class Histogram:
+    """A mergeable count of values in fixed buckets.
+
+    A histogram with edges e0 < e1 < ... < en has n + 2 buckets: values
+    below e0, values in [ei, ei+1) for each i, and values of at least en.
+    """
+
+    # === Private Attributes ===
+    # @type _edges: list[float]
+    #     The edges of the buckets, in increasing order.
+    # @type _counts: list[int]
+    #     The number of values in each bucket.
+
+    def __init__(self, edges):
+        """Initialize an empty Histogram with the bucket edges <edges>.
+
+        @type self: Histogram
+        @type edges: list[float]
+            Precondition: edges is sorted in increasing order.
+        @rtype: None
+        """
+        self._edges = list(edges)
+        self._counts = [0] * (len(self._edges) + 1)
+
+    def add(self, value):
+        """Add <value> to this Histogram.
+
+        @type self: Histogram
+        @type value: float
+        @rtype: None
+        """
+        self._counts[bisect_right(self._edges, value)] += 1
+
+    def merge(self, other):
+        """Add the counts of <other> to this Histogram.
+
+        Precondition: <other> has the same edges.
+
+        @type self: Histogram
+        @type other: Histogram
+        @rtype: None
+        """
+        for i, count in enumerate(other._counts):
+            self._counts[i] += count
+
+    def counts(self):
+        """Return a dict that maps the lower edge of each bucket to the
+        number of values in it. Values below the first edge are under the
+        key None.
+
+        @type self: Histogram
+        @rtype: dict[float | None, int]
+
+        >>> histogram = Histogram([0, 5, 10])
+        >>> for value in [-1, 0, 4, 5, 12]:
+        ...     histogram.add(value)
+        >>> histogram.counts()
+        {None: 1, 0: 2, 5: 1, 10: 1}
+        """
+        return dict(zip([None] + self._edges, self._counts))
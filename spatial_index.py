@@ -0,0 +1,270 @@
+"""
+The spatial_index module contains the DriverIndex class, a spatial index of
+idle drivers used by the Dispatcher to find the closest idle driver to a
+rider without scanning every registered driver.
+"""
+from location import manhattan_distance
+from travel import distance, get_travel_times
+
+
+class DriverIndex:
+    """A spatial index of the idle drivers registered with a dispatcher.
+
+    Idle drivers are bucketed by speed, and then by the grid cell containing
+    their location. The closest idle driver to a location, in travel time,
+    is found by visiting the cells in rings of increasing Manhattan distance
+    around the location until no unvisited cell can hold a closer driver.
+    Once the rings have visited as many cells as hold idle drivers of a
+    speed, as when only a few drivers are idle on a large grid, the cells
+    holding them are scanned instead.
+    Travel times are those of the travel time service, whose distances are
+    never shorter than the Manhattan distance.
+
+    Drivers added to the index notify it whenever they become idle or busy,
+    so the index always holds exactly the idle drivers.
+    """
+
+    # === Private Attributes ===
+    # @type _cell_size: int
+    #     The number of rows and columns covered by each grid cell.
+    # @type _grids: dict[int, dict[(int, int), dict[str, Driver]]]
+    #     Maps a speed to the cells holding idle drivers of that speed.
+    #     Each cell maps a driver identifier to the idle driver.
+    # @type _bounds: dict[int, list[int]]
+    #     Maps a speed to [min row, max row, min column, max column] of the
+    #     cells that have held idle drivers of that speed.
+    # @type _entries: dict[str, ((int, (int, int)) | None)]
+    #     Maps the identifier of every driver in the index to the speed and
+    #     cell it is stored under, or None if the driver is not idle.
+    # @type _order: dict[str, int]
+    #     Maps the identifier of every driver in the index to the order in
+    #     which it was added. Ties in travel time go to the earliest driver.
+    # @type _added: int
+    #     The number of times a driver has been added to the index.
+    # @type _size: int
+    #     The number of idle drivers in the index.
+
+    def __init__(self, cell_size=8):
+        """Initialize an empty DriverIndex.
+
+        @type self: DriverIndex
+        @type cell_size: int
+            The number of rows and columns covered by each grid cell.
+            Precondition: cell_size > 0
+        @rtype: None
+        """
+        self._cell_size = cell_size
+        self._grids = {}
+        self._bounds = {}
+        self._entries = {}
+        self._order = {}
+        self._added = 0
+        self._size = 0
+
+    def __len__(self):
+        """Return the number of idle drivers in this DriverIndex.
+
+        @type self: DriverIndex
+        @rtype: int
+        """
+        return self._size
+
+    def __contains__(self, driver):
+        """Return True iff <driver> has been added to this DriverIndex.
+
+        @type self: DriverIndex
+        @type driver: Driver
+        @rtype: bool
+        """
+        return driver.identifier in self._entries
+
+    def idle_drivers(self):
+        """Return the idle drivers in this DriverIndex, in the order they
+        were added.
+
+        @type self: DriverIndex
+        @rtype: list[Driver]
+        """
+        drivers = [driver for grid in self._grids.values()
+                   for cell in grid.values() for driver in cell.values()]
+        drivers.sort(key=lambda driver: self._order[driver.identifier])
+        return drivers
+
+    def add(self, driver):
+        """Add <driver> to this DriverIndex and track its idle status.
+
+        @type self: DriverIndex
+        @type driver: Driver
+        @rtype: None
+        """
+        self._order[driver.identifier] = self._added
+        self._added += 1
+        self._entries[driver.identifier] = None
+        driver.index = self
+        self.update(driver)
+
+    def remove(self, driver):
+        """Remove <driver> from this DriverIndex and stop tracking its idle
+        status.
+
+        @type self: DriverIndex
+        @type driver: Driver
+        @rtype: None
+        """
+        entry = self._entries.pop(driver.identifier)
+        if entry is not None:
+            speed, cell = entry
+            drivers = self._grids[speed][cell]
+            del drivers[driver.identifier]
+            if not drivers:
+                del self._grids[speed][cell]
+            self._size -= 1
+        del self._order[driver.identifier]
+        driver.index = None
+
+    def update(self, driver):
+        """Move <driver> to the cell for its current location if it is idle,
+        or remove it from its cell if it is busy.
+
+        @type self: DriverIndex
+        @type driver: Driver
+        @rtype: None
+        """
+        entry = self._entries[driver.identifier]
+        if entry is not None:
+            speed, cell = entry
+            drivers = self._grids[speed][cell]
+            del drivers[driver.identifier]
+            if not drivers:
+                del self._grids[speed][cell]
+            self._size -= 1
+            entry = None
+        if driver.idle:
+            speed = driver.speed
+            cell = (driver.location.row // self._cell_size,
+                    driver.location.column // self._cell_size)
+            grid = self._grids.setdefault(speed, {})
+            grid.setdefault(cell, {})[driver.identifier] = driver
+            self._extend_bounds(speed, cell)
+            self._size += 1
+            entry = (speed, cell)
+        self._entries[driver.identifier] = entry
+
+    def nearest(self, location):
+        """Return the idle driver with the smallest travel time to
+        <location>, or None if there is no idle driver.
+
+        Ties are broken in favour of the driver added to the index first.
+
+        @type self: DriverIndex
+        @type location: Location
+        @rtype: Driver | None
+
+        >>> from driver import Driver
+        >>> from location import Location
+        >>> index = DriverIndex(2)
+        >>> for name, row, speed in [("a", 0, 1), ("b", 9, 1), ("c", 20, 4)]:
+        ...     index.add(Driver(name, Location(row, 0), speed))
+        >>> print(index.nearest(Location(8, 0)))
+        b
+        >>> print(index.nearest(Location(16, 0)))
+        c
+        """
+        size = self._cell_size
+        row = location.row // size
+        column = location.column // size
+        manhattan = get_travel_times().manhattan
+        best = None
+        best_key = None
+        for speed, grid in self._grids.items():
+            if not grid:
+                continue
+            min_row, max_row, min_column, max_column = self._bounds[speed]
+            last_ring = max(abs(row - min_row), abs(row - max_row)) + \
+                max(abs(column - min_column), abs(column - max_column))
+            occupied = len(grid)
+            visited = 0
+            for ring in range(last_ring + 1):
+                if best_key is not None and \
+                        _ring_lower_bound(ring, size) / speed > best_key[0]:
+                    break
+                scan = visited >= occupied
+                if scan:
+                    cells = grid.values()
+                else:
+                    cells = _ring_cells(row, column, ring)
+                    visited += len(cells)
+                    cells = map(grid.get, cells)
+                for drivers in cells:
+                    if not drivers:
+                        continue
+                    for driver in drivers.values():
+                        key = (manhattan_distance(driver.location,
+                                                  location) / speed,
+                               self._order[driver.identifier])
+                        # Other distances are never shorter, so only the
+                        # drivers that might beat the best are measured.
+                        if not manhattan and (best_key is None or
+                                              key < best_key):
+                            key = (distance(driver.location, location) /
+                                   speed, key[1])
+                        if best_key is None or key < best_key:
+                            best = driver
+                            best_key = key
+                if scan:
+                    break
+        return best
+
+    def _extend_bounds(self, speed, cell):
+        """Grow the bounding box of the cells used for <speed> to include
+        <cell>.
+
+        @type self: DriverIndex
+        @type speed: int
+        @type cell: (int, int)
+        @rtype: None
+        """
+        bounds = self._bounds.get(speed)
+        if bounds is None:
+            self._bounds[speed] = [cell[0], cell[0], cell[1], cell[1]]
+        else:
+            bounds[0] = min(bounds[0], cell[0])
+            bounds[1] = max(bounds[1], cell[0])
+            bounds[2] = min(bounds[2], cell[1])
+            bounds[3] = max(bounds[3], cell[1])
+
+
+def _ring_cells(row, column, ring):
+    """Return the cells whose Manhattan distance from the cell at <row>,
+    <column> is exactly <ring>.
+
+    @type row: int
+    @type column: int
+    @type ring: int
+    @rtype: list[(int, int)]
+
+    >>> sorted(_ring_cells(0, 0, 1))
+    [(-1, 0), (0, -1), (0, 1), (1, 0)]
+    """
+    if ring == 0:
+        return [(row, column)]
+    cells = []
+    for row_offset in range(-ring, ring + 1):
+        column_offset = ring - abs(row_offset)
+        cells.append((row + row_offset, column + column_offset))
+        if column_offset != 0:
+            cells.append((row + row_offset, column - column_offset))
+    return cells
+
+
+def _ring_lower_bound(ring, cell_size):
+    """Return a lower bound on the Manhattan distance between a location and
+    any location in a cell <ring> cells away from the location's cell.
+
+    @type ring: int
+    @type cell_size: int
+    @rtype: int
+    """
+    if ring <= 1:
+        return ring
+    return (ring - 2) * cell_size + 2
@@ -0,0 +1,215 @@
+"""
+The sweep module runs a simulation for every point of a parameter grid,
+caching each result on disk.
+
+Every point is a scenario derived from a base event file by overriding some
+of these parameters:
+
+    drivers   the number of driver requests kept from the file
+    speed     the speed of every driver
+    patience  the patience of every rider
+
+The scenarios are run in a pool of worker processes, which use the same
+travel time service as the caller. The report of each scenario is saved to
+a JSON file in the cache directory, named by a hash of the contents of the
+event file, the parameters and the travel time service in use, so running
+a sweep again only simulates the points that are not cached yet. The cache
+directory is given by --cache, or else by the SWEEP_CACHE environment
+variable, or else is .sweep_cache in the current directory.
+
+Run it as a script:
+
+    python sweep.py [--drivers N ...] [--speed N ...] [--patience N ...]
+                    [--workers N] [--cache DIRECTORY] <event file>
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from event import DriverRequest, RiderRequest
+from replication import read_events
+from simulation import Simulation
+from travel import get_travel_times, set_travel_times
+
+# The parameters a scenario can override, and the default cache directory.
+PARAMETERS = ["drivers", "speed", "patience"]
+CACHE_DIRECTORY = os.environ.get("SWEEP_CACHE", ".sweep_cache")
+
+
+def parameter_grid(grid):
+    """Return every combination of the values in <grid>, which maps each
+    parameter to the values to sweep it over.
+
+    @type grid: dict[str, list[int]]
+    @rtype: list[dict[str, int]]
+
+    >>> parameter_grid({"speed": [1, 2], "drivers": [3]})
+    [{'drivers': 3, 'speed': 1}, {'drivers': 3, 'speed': 2}]
+    """
+    names = sorted(grid)
+    return [dict(zip(names, values))
+            for values in itertools.product(*[grid[name] for name in names])]
+
+
+def scenario_events(filename, parameters):
+    """Yield the events in <filename> with the overrides in <parameters>.
+
+    @type filename: str
+    @type parameters: dict[str, int]
+        Maps some of PARAMETERS to their values.
+    @rtype: iterator[Event]
+
+    >>> events = list(scenario_events("events.txt", {"drivers": 1,
+    ...                                              "patience": 3}))
+    >>> [str(event) for event in events][:2]
+    ['0 -- Amaranth: Request a rider', '0 -- Almond: Request a driver']
+    >>> events[1].rider.patience
+    3
+    """
+    unknown = set(parameters) - set(PARAMETERS)
+    if unknown:
+        raise ValueError("Unknown parameters: {}".format(sorted(unknown)))
+    drivers = parameters.get("drivers")
+    for event in read_events(filename):
+        if isinstance(event, DriverRequest):
+            if drivers is not None:
+                if drivers <= 0:
+                    continue
+                drivers -= 1
+            if "speed" in parameters:
+                event.driver.speed = parameters["speed"]
+        elif isinstance(event, RiderRequest) and "patience" in parameters:
+            event.rider.patience = parameters["patience"]
+        yield event
+
+
+def run_scenario(filename, parameters):
+    """Run a simulation of the scenario <parameters> derived from
+    <filename> and return its report, or None if a statistic of the report
+    is undefined because nothing was measured for it.
+
+    @type filename: str
+    @type parameters: dict[str, int]
+    @rtype: dict[str, object] | None
+    """
+    try:
+        return Simulation().run(list(scenario_events(filename, parameters)))
+    except ZeroDivisionError:
+        return None
+
+
+def file_digest(filename):
+    """Return the SHA-256 hex digest of the contents of <filename>.
+
+    @type filename: str
+    @rtype: str
+    """
+    digest = hashlib.sha256()
+    with open(filename, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(digest, parameters):
+    """Return the cache key of the scenario <parameters> derived from the
+    event file with contents hash <digest>, simulated with the travel time
+    service in use.
+
+    @type digest: str
+    @type parameters: dict[str, int]
+    @rtype: str
+    """
+    text = digest + json.dumps(parameters, sort_keys=True) + \
+        get_travel_times().fingerprint()
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def run_sweep(filename, grid, cache_directory=CACHE_DIRECTORY,
+              workers=None):
+    """Return the parameters and report of every point of the parameter
+    grid <grid> over the event file <filename>, in the order of
+    parameter_grid(grid). The report is None for the points that
+    run_scenario could not report on.
+
+    Points cached in <cache_directory> are read from it, and the rest are
+    run in a pool of <workers> processes and written to it.
+
+    @type filename: str
+    @type grid: dict[str, list[int]]
+    @type cache_directory: str
+    @type workers: int | None
+        The number of worker processes, or None for one per CPU.
+    @rtype: list[(dict[str, int], dict[str, object] | None)]
+    """
+    points = parameter_grid(grid)
+    digest = file_digest(filename)
+    paths = [os.path.join(cache_directory,
+                          cache_key(digest, parameters) + ".json")
+             for parameters in points]
+    reports = [None] * len(points)
+    missing = []
+    for i, path in enumerate(paths):
+        if os.path.exists(path):
+            with open(path) as file:
+                reports[i] = json.load(file)
+        else:
+            missing.append(i)
+
+    if missing:
+        os.makedirs(cache_directory, exist_ok=True)
+        with ProcessPoolExecutor(
+                workers, initializer=set_travel_times,
+                initargs=(get_travel_times(),)) as executor:
+            results = executor.map(run_scenario, [filename] * len(missing),
+                                   [points[i] for i in missing])
+            for i, report in zip(missing, results):
+                reports[i] = report
+                _write_json(paths[i], report)
+    return list(zip(points, reports))
+
+
+def _write_json(path, value):
+    """Write <value> to the JSON file <path>, replacing it atomically so that
+    an interrupted sweep never leaves a partial result in the cache.
+
+    @type path: str
+    @type value: object
+    @rtype: None
+    """
+    temporary = "{}.{}.tmp".format(path, os.getpid())
+    with open(temporary, "w") as file:
+        json.dump(value, file)
+    os.replace(temporary, path)
+
+
+def _main():
+    """Run the sweep given on the command line and print the report of each
+    point.
+
+    @rtype: None
+    """
+    parser = argparse.ArgumentParser(
+        description="Sweep simulation parameters over an event file.")
+    parser.add_argument("file", help="text or binary event file")
+    for name in PARAMETERS:
+        parser.add_argument("--" + name, type=int, nargs="+",
+                            help="values of {} to sweep".format(name))
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes")
+    parser.add_argument("--cache", default=CACHE_DIRECTORY,
+                        help="directory of cached results")
+    arguments = parser.parse_args()
+
+    grid = {name: getattr(arguments, name) for name in PARAMETERS
+            if getattr(arguments, name) is not None}
+    for parameters, report in run_sweep(arguments.file, grid, arguments.cache,
+                                        arguments.workers):
+        print(parameters, report)
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,187 @@
+"""
+The travel module contains the TravelTimes class, the service that the
+drivers, dispatcher and monitors use to find distances and travel times,
+and functions that use the current service.
+
+A travel time only depends on the distance travelled and the speed, so the
+service keeps a lookup table of the travel time for every distance on a
+bounded grid for each speed it has seen, and an LRU cache of bounded size
+for the (distance, speed) pairs too far apart for the tables.
+"""
+from collections import OrderedDict
+
+from location import manhattan_distance
+
+# The default number of rows and columns covered by the lookup tables, and
+# the default number of entries in the cache.
+GRID_SIZE = 1024
+CACHE_SIZE = 4096
+
+
+class TravelTimes:
+    """The distances and travel times between locations on the grid.
+
+    Distances are Manhattan distances. A subclass can measure them another
+    way, but never shorter than the Manhattan distance, since the
+    DriverIndex and the Fleet use it as a lower bound.
+
+    === Attributes ===
+    @type manhattan: bool
+        Whether distances are Manhattan distances.
+    @type table_hits: int
+        The number of travel times found in a lookup table.
+    @type cache_hits: int
+        The number of travel times found in the cache.
+    @type cache_misses: int
+        The number of travel times computed and added to the cache.
+    """
+
+    manhattan = True
+
+    # === Private Attributes ===
+    # @type _table_size: int
+    #     The number of distances covered by each lookup table.
+    # @type _tables: dict[int, list[int]]
+    #     Maps each speed to the travel time of each distance less than
+    #     _table_size at that speed.
+    # @type _cache_size: int
+    #     The largest number of entries in the cache.
+    # @type _cache: OrderedDict[(int, int), int]
+    #     Maps (distance, speed) pairs to their travel time, least recently
+    #     used first.
+
+    def __init__(self, grid_size=GRID_SIZE, cache_size=CACHE_SIZE):
+        """Initialize a TravelTimes with empty tables and cache.
+
+        @type self: TravelTimes
+        @type grid_size: int | None
+            The number of rows and columns of the grid that the lookup
+            tables cover, or None to only use the cache.
+        @type cache_size: int
+            The largest number of entries in the cache.
+            Precondition: cache_size > 0
+        @rtype: None
+        """
+        self._table_size = 0 if grid_size is None else 2 * grid_size - 1
+        self._tables = {}
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+        self.table_hits = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def distance(self, origin, destination):
+        """Return the distance from <origin> to <destination>.
+
+        @type self: TravelTimes
+        @type origin: Location
+        @type destination: Location
+        @rtype: int
+        """
+        return manhattan_distance(origin, destination)
+
+    def travel_time(self, origin, destination, speed):
+        """Return the time it takes to travel from <origin> to
+        <destination> at <speed>, rounded to the nearest integer.
+
+        @type self: TravelTimes
+        @type origin: Location
+        @type destination: Location
+        @type speed: int
+        @rtype: int
+
+        >>> from location import Location
+        >>> times = TravelTimes(grid_size=4, cache_size=1)
+        >>> times.travel_time(Location(0, 0), Location(3, 3), 4)
+        2
+        >>> times.travel_time(Location(0, 0), Location(9, 0), 2)
+        4
+        >>> times.travel_time(Location(9, 0), Location(0, 0), 2)
+        4
+        >>> times.counters()
+        {'table_hits': 1, 'cache_hits': 1, 'cache_misses': 1}
+        """
+        distance = self.distance(origin, destination)
+        if distance < self._table_size:
+            table = self._tables.get(speed)
+            if table is None:
+                table = [round(d / speed) for d in range(self._table_size)]
+                self._tables[speed] = table
+            self.table_hits += 1
+            return table[distance]
+
+        key = (distance, speed)
+        time = self._cache.get(key)
+        if time is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return time
+        time = round(distance / speed)
+        self._cache[key] = time
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        self.cache_misses += 1
+        return time
+
+    def fingerprint(self):
+        """Return a string that differs between services that measure
+        distances differently.
+
+        @type self: TravelTimes
+        @rtype: str
+        """
+        return "manhattan"
+
+    def counters(self):
+        """Return the hit and miss counters.
+
+        @type self: TravelTimes
+        @rtype: dict[str, int]
+        """
+        return {"table_hits": self.table_hits, "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses}
+
+
+# The service used by the functions below.
+_service = TravelTimes()
+
+
+def get_travel_times():
+    """Return the travel time service in use.
+
+    @rtype: TravelTimes
+    """
+    return _service
+
+
+def set_travel_times(service):
+    """Use <service> for every distance and travel time from now on.
+
+    @type service: TravelTimes
+    @rtype: None
+    """
+    global _service
+    _service = service
+
+
+def distance(origin, destination):
+    """Return the distance from <origin> to <destination>, according to the
+    travel time service in use.
+
+    @type origin: Location
+    @type destination: Location
+    @rtype: int
+    """
+    return _service.distance(origin, destination)
+
+
+def travel_time(origin, destination, speed):
+    """Return the time it takes to travel from <origin> to <destination> at
+    <speed>, according to the travel time service in use.
+
+    @type origin: Location
+    @type destination: Location
+    @type speed: int
+    @rtype: int
+    """
+    return _service.travel_time(origin, destination, speed)
@@ -0,0 +1,228 @@
+"""
+The workload module generates synthetic workloads: seeded streams of driver
+and rider requests of any length.
+
+Requests arrive as a Poisson process, so the time between consecutive
+requests is exponentially distributed. Drivers start at uniformly random
+locations. Riders start near one of a few hotspots with probability
+<hotspot_fraction>, and at a uniformly random location otherwise, and go to
+a uniformly random destination.
+
+The events are generated lazily, in timestamp order, so a workload can be
+streamed straight into Simulation.run(events, stream=True), or written to a
+text or binary event file, in constant memory.
+
+Run it as a script:
+
+    python workload.py [--seed N] [--grid-size N] [--rate R] ...
+                       <number of events> <output file>
+"""
+import argparse
+import random
+
+from binary_events import write_event_stream
+from driver import Driver
+from event import DriverRequest, RiderRequest
+from location import Location
+from rider import Rider, WAITING
+
+
+class Workload:
+    """A description of a synthetic workload.
+
+    Iterating over a Workload yields the same events every time.
+
+    === Attributes ===
+    @type count: int
+        The number of events.
+    @type seed: int
+        The seed of the random number generator.
+    @type grid_size: int
+        The number of rows and columns of the grid.
+    @type rate: float
+        The average number of requests per unit of time.
+    @type driver_fraction: float
+        The probability that a request is a driver request.
+    @type hotspots: int
+        The number of hotspots.
+    @type hotspot_fraction: float
+        The probability that a rider starts near a hotspot.
+    @type hotspot_spread: float
+        The standard deviation of the distance of a rider from its hotspot,
+        along each axis.
+    @type speeds: (int, int)
+        The smallest and largest driver speed.
+    @type patience: (int, int)
+        The smallest and largest rider patience.
+    """
+
+    def __init__(self, count, seed=0, grid_size=100, rate=1.0,
+                 driver_fraction=0.2, hotspots=4, hotspot_fraction=0.7,
+                 hotspot_spread=None, speeds=(1, 5), patience=(5, 60)):
+        """Initialize a Workload.
+
+        @type self: Workload
+        @type count: int
+        @type seed: int
+        @type grid_size: int
+        @type rate: float
+            Precondition: rate > 0
+        @type driver_fraction: float
+        @type hotspots: int
+        @type hotspot_fraction: float
+        @type hotspot_spread: float | None
+            A twentieth of the grid size if this is None.
+        @type speeds: (int, int)
+        @type patience: (int, int)
+        @rtype: None
+        """
+        self.count = count
+        self.seed = seed
+        self.grid_size = grid_size
+        self.rate = rate
+        self.driver_fraction = driver_fraction
+        self.hotspots = hotspots
+        self.hotspot_fraction = hotspot_fraction
+        if hotspot_spread is None:
+            hotspot_spread = grid_size / 20
+        self.hotspot_spread = hotspot_spread
+        self.speeds = speeds
+        self.patience = patience
+
+    def __iter__(self):
+        """Yield the events of this Workload in timestamp order.
+
+        @type self: Workload
+        @rtype: iterator[DriverRequest | RiderRequest]
+
+        >>> events = list(Workload(1000, seed=1, grid_size=10))
+        >>> len(events)
+        1000
+        >>> [str(event) for event in events] == \\
+        ...     [str(event) for event in Workload(1000, seed=1, grid_size=10)]
+        True
+        >>> timestamps = [event.timestamp for event in events]
+        >>> timestamps == sorted(timestamps)
+        True
+        """
+        generator = random.Random(self.seed)
+        size = self.grid_size
+        centres = [(generator.randrange(size), generator.randrange(size))
+                   for _ in range(self.hotspots)]
+        time = 0.0
+        for i in range(self.count):
+            time += generator.expovariate(self.rate)
+            if generator.random() < self.driver_fraction:
+                location = _uniform(generator, size)
+                yield DriverRequest(int(time),
+                                    Driver("Driver{}".format(i), location,
+                                           generator.randint(*self.speeds)))
+            else:
+                if centres and generator.random() < self.hotspot_fraction:
+                    row, column = generator.choice(centres)
+                    origin = Location(
+                        _clamp(generator.gauss(row, self.hotspot_spread),
+                               size),
+                        _clamp(generator.gauss(column, self.hotspot_spread),
+                               size))
+                else:
+                    origin = _uniform(generator, size)
+                yield RiderRequest(int(time),
+                                   Rider("Rider{}".format(i), origin,
+                                         _uniform(generator, size), WAITING,
+                                         generator.randint(*self.patience)))
+
+
+def _uniform(generator, size):
+    """Return a uniformly random location on a <size> by <size> grid.
+
+    @type generator: random.Random
+    @type size: int
+    @rtype: Location
+    """
+    return Location(generator.randrange(size), generator.randrange(size))
+
+
+def _clamp(coordinate, size):
+    """Return <coordinate> rounded to the nearest row or column of a <size>
+    by <size> grid.
+
+    @type coordinate: float
+    @type size: int
+    @rtype: int
+    """
+    return min(max(round(coordinate), 0), size - 1)
+
+
+def write_text_events(filename, events):
+    """Write <events> to the text event file <filename>, and return the
+    number of events written.
+
+    @type filename: str
+    @type events: iterable[DriverRequest | RiderRequest]
+    @rtype: int
+
+    >>> import os, tempfile
+    >>> from event import create_event_list
+    >>> path = os.path.join(tempfile.mkdtemp(), "events.txt")
+    >>> write_text_events(path, create_event_list("events.txt"))
+    12
+    >>> [str(event) for event in create_event_list(path)] == \\
+    ...     [str(event) for event in create_event_list("events.txt")]
+    True
+    """
+    count = 0
+    with open(filename, "w") as file:
+        for event in events:
+            if isinstance(event, DriverRequest):
+                driver = event.driver
+                file.write("{} DriverRequest {} {} {}\n".format(
+                    event.timestamp, driver.identifier, driver.location,
+                    driver.speed))
+            else:
+                rider = event.rider
+                file.write("{} RiderRequest {} {} {} {}\n".format(
+                    event.timestamp, rider.identifier, rider.origin,
+                    rider.destination, rider.patience))
+            count += 1
+    return count
+
+
+def _main():
+    """Generate the workload given on the command line and write it to a
+    text or binary event file.
+
+    @rtype: None
+    """
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic event file.")
+    parser.add_argument("count", type=int, help="number of events")
+    parser.add_argument("output", help="event file to write")
+    parser.add_argument("--binary", action="store_true",
+                        help="write the binary format")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--grid-size", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=1.0,
+                        help="average requests per unit of time")
+    parser.add_argument("--driver-fraction", type=float, default=0.2)
+    parser.add_argument("--hotspots", type=int, default=4)
+    parser.add_argument("--hotspot-fraction", type=float, default=0.7)
+    parser.add_argument("--hotspot-spread", type=float, default=None)
+    parser.add_argument("--speeds", type=int, nargs=2, default=(1, 5))
+    parser.add_argument("--patience", type=int, nargs=2, default=(5, 60))
+    arguments = parser.parse_args()
+
+    workload = Workload(arguments.count, arguments.seed, arguments.grid_size,
+                        arguments.rate, arguments.driver_fraction,
+                        arguments.hotspots, arguments.hotspot_fraction,
+                        arguments.hotspot_spread, tuple(arguments.speeds),
+                        tuple(arguments.patience))
+    if arguments.binary:
+        count = write_event_stream(arguments.output, workload)
+    else:
+        count = write_text_events(arguments.output, workload)
+    print("{} events written".format(count))
+
+
+if __name__ == "__main__":
+    _main()